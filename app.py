@@ -1,39 +1,146 @@
+import time
+
+# Inizio dell'esecuzione dello script: base per misurare il tempo di primo disegno
+_INIZIO = time.perf_counter()
+
+import importlib
+import json
+import logging
+import os
+import threading
+
 import streamlit as st
 from streamlit_option_menu import option_menu
-import calcolatore_iva
-import riconciliazione_doganale
-import gestione_documentale
-import dashboard_cambi
-import partita_doppia
-import fx_risk_app
-import sys
 
-print(sys.executable)
+import strumentazione
+from strumentazione import misura
+
+logger = logging.getLogger("hub")
+# Senza handler le righe INFO dei tempi non comparirebbero nel terminale di "streamlit run".
+# Lo script viene rieseguito a ogni rerun, il logger invece resta: un solo handler.
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+# Registro delle pagine: titolo nel menu → (modulo con la funzione main(), icona bootstrap-icons).
+# I moduli vengono importati solo quando la pagina viene selezionata.
+PAGINE = {
+    "Calcolatore IVA": ("calcolatore_iva", "calculator"),
+    "Riconciliazione Doganale": ("riconciliazione_doganale", "table"),
+    "Gestione Documentale": ("gestione_documentale", "folder"),
+    "Dashboard cambi e margini": ("dashboard_cambi", "currency-exchange"),
+    "Partita doppia": ("partita_doppia", "journal-text"),
+    "Analisi del rischio cambio per importazioni": ("fx_risk_app", "graph-down"),
+}
+
+# Dipendenze pesanti usate dalle pagine, importate in background dopo il primo disegno
+DIPENDENZE_PESANTI = ["numpy", "pandas", "matplotlib", "plotly.express", "requests"]
+
+# Se impostata, ogni esecuzione aggiunge una riga JSON con i tempi a questo file
+FILE_TEMPI_AVVIO = os.environ.get("HUB_TEMPI_AVVIO")
+
+
+def _importa_in_background(moduli):
+    for nome in moduli:
+        try:
+            importlib.import_module(nome)
+        except Exception:
+            # l'errore verrà mostrato quando la pagina importa il modulo
+            logger.debug("Preriscaldamento di %s fallito", nome, exc_info=True)
+
+
+# cache_resource: eseguito una sola volta per processo, non a ogni rerun
+@st.cache_resource(show_spinner=False)
+def preriscalda():
+    moduli = DIPENDENZE_PESANTI + [modulo for modulo, _ in PAGINE.values()]
+    thread = threading.Thread(target=_importa_in_background, args=(moduli,), name="preriscaldamento", daemon=True)
+    thread.start()
+    # stato condiviso del processo: "misurato" diventa True dopo il primo rerun
+    return {"avvio": time.time(), "misurato": False}
+
+
+def carica_pagina(titolo):
+    modulo, _ = PAGINE[titolo]
+    return importlib.import_module(modulo)
+
+
+def registra_tempi(pagina, primo_disegno, totale, a_freddo):
+    logger.info("Hub: primo disegno %.1f ms, pagina '%s' %.1f ms%s",
+                primo_disegno * 1000, pagina, totale * 1000, " (avvio a freddo)" if a_freddo else "")
+    if FILE_TEMPI_AVVIO:
+        with open(FILE_TEMPI_AVVIO, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "a_freddo": a_freddo,
+                "pagina": pagina,
+                "primo_disegno_ms": round(primo_disegno * 1000, 2),
+                "totale_ms": round(totale * 1000, 2),
+            }) + "\n")
+
+
+# --- Pannello prestazioni (solo con HUB_DEBUG=1)
+# Tempi per fase del rerun corrente, profilo di un singolo rerun, esportazione delle tracce.
+def pannello_prestazioni(rerun, profilo):
+    with st.sidebar.expander("🛠️ Prestazioni", expanded=rerun is not None or profilo is not None):
+        st.checkbox("Misura tempi per fase", key="debug_tempi")
+        st.button("Profila il prossimo rerun", on_click=lambda: st.session_state.update(debug_profila=True))
+        if strumentazione.PROFILATORE == "pyinstrument":
+            st.caption("Profilatore: pyinstrument (a campionamento)")
+        else:
+            st.caption("Profilatore: cProfile (deterministico, sovrastima le chiamate brevi come quelle di pandas). "
+                       "Per il campionamento: `pip install -r requirements-dev.txt`")
+        if rerun is not None:
+            tracce = st.session_state.setdefault("debug_tracce", [])
+            tracce.append(rerun)
+            del tracce[:-50]  # solo gli ultimi 50 rerun
+            st.write(f"Rerun: {rerun['durata_ms']:,.1f} ms")
+            st.dataframe(strumentazione.riepilogo(rerun), hide_index=True)
+            if st.button(f"💾 Esporta tracce ({len(tracce)} rerun)", key="debug_esporta"):
+                st.success(f"Tracce salvate in {strumentazione.esporta_tracce(tracce)}")
+        if profilo is not None:
+            percorso, testo = profilo
+            st.write(f"Profilo {strumentazione.PROFILATORE} salvato in `{percorso}`")
+            st.code(testo[:20000], language=None)
+
 
 st.set_page_config(page_title="Hub Progetti Contabilità", page_icon="📂", layout="wide")
 
+# Misura e profilo del rerun: attivati dal pannello prestazioni, altrimenti a costo quasi nullo
+profilatore = None
+if strumentazione.PANNELLO_ATTIVO:
+    if st.session_state.get("debug_tempi", False):
+        strumentazione.inizia_rerun("hub")
+    if st.session_state.pop("debug_profila", False):
+        profilatore = strumentazione.ProfiloRerun()
+        profilatore.avvia()
+
 st.markdown("<h1 style='text-align: center;'>📂 Hub Progetti Contabilità</h1>", unsafe_allow_html=True)
 
-selected = option_menu(
-    menu_title=None,
-    options=["Calcolatore IVA", "Riconciliazione Doganale", "Gestione Documentale",
-              "Dashboard cambi e margini", "Partita doppia",
-              "Analisi del rischio cambio per importazioni"],
-    icons=["calculator", "table", "folder"],       # icone da bootstrap-icons
-    menu_icon="cast",
-    default_index=0,
-    orientation="horizontal"
-)
-
-if selected == "Calcolatore IVA":
-    calcolatore_iva.main()
-elif selected == "Riconciliazione Doganale":
-    riconciliazione_doganale.main()
-elif selected == "Gestione Documentale":
-    gestione_documentale.main()
-elif selected == "Dashboard cambi e margini":
-    dashboard_cambi.main()
-elif selected == "Partita doppia":
-    partita_doppia.main()
-elif selected == "Analisi del rischio cambio per importazioni":
-    fx_risk_app.main()
\ No newline at end of file
+with misura("menu"):
+    selected = option_menu(
+        menu_title=None,
+        options=list(PAGINE),
+        icons=[icona for _, icona in PAGINE.values()],       # icone da bootstrap-icons
+        menu_icon="cast",
+        default_index=0,
+        orientation="horizontal"
+    )
+primo_disegno = time.perf_counter() - _INIZIO
+
+# Il primo rerun del processo avvia il preriscaldamento: è l'avvio a freddo
+stato_processo = preriscalda()
+a_freddo = not stato_processo["misurato"]
+stato_processo["misurato"] = True
+
+try:
+    with misura(f"pagina: {selected}"):
+        carica_pagina(selected).main()
+finally:
+    # anche quando la pagina si interrompe con st.stop()
+    registra_tempi(selected, primo_disegno, time.perf_counter() - _INIZIO, a_freddo)
+    rerun = strumentazione.termina_rerun()
+    profilo = profilatore.ferma() if profilatore is not None else None
+    if strumentazione.PANNELLO_ATTIVO:
+        pannello_prestazioni(rerun, profilo)
@@ -0,0 +1,359 @@
+# archivio_documenti.py
+"""
+Archivio persistente dei documenti export.
+- I file vengono salvati su disco indirizzati per contenuto (SHA-256):
+  lo stesso file caricato più volte occupa spazio una sola volta.
+- Un indice SQLite tiene i metadati (nome, tipo, data, hash, dimensione).
+- Un registro append-only (JSON Lines) traccia ogni salvataggio.
+- Un indice full-text SQLite FTS5 sul nome e sul contenuto dei documenti
+  permette di cercare numeri fattura, codici HS o clienti.
+- Ogni documento ha uno stato (in coda → in elaborazione → completato/errore):
+  l'elaborazione (hash, testo, righe/pagine, anteprima) può girare in
+  background, vedi elaborazione_documenti.
+"""
+
+import base64
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import date, datetime
+
+import pandas as pd
+
+from estrazione_testo import estrai_testo, conta_righe, conta_pagine, crea_anteprima
+
+CARTELLA_ARCHIVIO = "archivio"
+
+# Stati di elaborazione di un documento
+IN_CODA = "in coda"
+IN_ELABORAZIONE = "in elaborazione"
+COMPLETATO = "completato"
+ERRORE = "errore"
+
+# colonne aggiunte dopo la prima versione dello schema (migrazione con ALTER TABLE)
+COLONNE_ELABORAZIONE = {
+    "stato": "TEXT",
+    "righe": "INTEGER",
+    "pagine": "INTEGER",
+    "anteprima": "TEXT",
+    "errore": "TEXT",
+}
+
+_lock_registro = threading.Lock()
+
+
+def percorsi(base_dir=CARTELLA_ARCHIVIO):
+    """Restituisce i percorsi usati dall'archivio (blob, database, registro)."""
+    return {
+        "blob": os.path.join(base_dir, "blob"),
+        "anteprime": os.path.join(base_dir, "anteprime"),
+        "coda": os.path.join(base_dir, "coda"),
+        "db": os.path.join(base_dir, "documenti.db"),
+        "registro": os.path.join(base_dir, "registro.jsonl"),
+    }
+
+
+def connetti(base_dir=CARTELLA_ARCHIVIO):
+    # check_same_thread=False: Streamlit può rieseguire lo script su thread diversi
+    # timeout: attende invece di fallire se un worker sta scrivendo
+    conn = sqlite3.connect(percorsi(base_dir)["db"], check_same_thread=False, timeout=30)
+    return conn
+
+
+# Database connection
+def init_archivio(base_dir=CARTELLA_ARCHIVIO):
+    p = percorsi(base_dir)
+    os.makedirs(p["blob"], exist_ok=True)
+    os.makedirs(p["anteprime"], exist_ok=True)
+    os.makedirs(p["coda"], exist_ok=True)
+    conn = connetti(base_dir)
+    # WAL: la pagina può leggere l'elenco mentre i worker scrivono
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS documenti (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome_file TEXT,
+    tipo_documento TEXT,
+    data_caricamento TEXT,
+    sha256 TEXT,
+    dimensione INTEGER
+    )
+    """)
+    esistenti = {r[1] for r in conn.execute("PRAGMA table_info(documenti)")}
+    for colonna, tipo in COLONNE_ELABORAZIONE.items():
+        if colonna not in esistenti:
+            conn.execute(f"ALTER TABLE documenti ADD COLUMN {colonna} {tipo}")
+    # documenti salvati prima degli stati: erano già elaborati al salvataggio
+    conn.execute("UPDATE documenti SET stato = ? WHERE stato IS NULL AND sha256 IS NOT NULL", (COMPLETATO,))
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_documenti_tipo ON documenti (tipo_documento)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_documenti_sha ON documenti (sha256)")
+    # Indice full-text: rowid = documenti.id
+    # remove_diacritics → "Societe" trova anche "Société", utile per nomi clienti
+    conn.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS documenti_fts USING fts5 (
+    nome_file,
+    testo,
+    tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """)
+    conn.commit()
+    indicizza_mancanti(conn, base_dir)
+    return conn
+
+
+def percorso_blob(sha256, base_dir=CARTELLA_ARCHIVIO):
+    # i primi due caratteri dell'hash fanno da sottocartella, così nessuna
+    # directory contiene troppi file
+    return os.path.join(percorsi(base_dir)["blob"], sha256[:2], sha256)
+
+
+def salva_blob(dati, base_dir=CARTELLA_ARCHIVIO):
+    """
+    Salva il contenuto del file e ne restituisce lo SHA-256.
+    Se il blob esiste già non viene riscritto (deduplicazione).
+    La scrittura passa da un file temporaneo + os.replace, quindi un blob
+    presente su disco è sempre completo.
+    """
+    sha256 = hashlib.sha256(dati).hexdigest()
+    destinazione = percorso_blob(sha256, base_dir)
+    if os.path.exists(destinazione):
+        return sha256
+    os.makedirs(os.path.dirname(destinazione), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(destinazione))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(dati)
+        os.replace(tmp, destinazione)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return sha256
+
+
+def leggi_blob(sha256, base_dir=CARTELLA_ARCHIVIO):
+    with open(percorso_blob(sha256, base_dir), "rb") as f:
+        return f.read()
+
+
+def _scrivi_registro(eventi, base_dir=CARTELLA_ARCHIVIO):
+    # registro append-only: una riga JSON per documento salvato, mai riscritta
+    # il lock evita righe mescolate quando scrivono più worker insieme
+    with _lock_registro, open(percorsi(base_dir)["registro"], "a", encoding="utf-8") as f:
+        for evento in eventi:
+            f.write(json.dumps(evento, ensure_ascii=False) + "\n")
+
+
+# Registrazione dei documenti caricati, senza elaborarli
+# conn → connessione all'indice SQLite.
+# nomi_file → lista dei nomi dei file caricati.
+# tipo_documento → es. Fattura, Dogana, Certificato.
+# Restituisce gli id assegnati, nello stesso ordine dei nomi.
+# Il nome entra subito nell'indice full-text (con testo vuoto): il documento
+# si trova per nome anche mentre è in coda, e resta ricercabile per nome se
+# l'elaborazione fallisce. elabora_documento sovrascrive la riga con il testo.
+def registra_caricamenti(conn, nomi_file, tipo_documento):
+    oggi = str(date.today())
+    ids = []
+    with conn:
+        for nome_file in nomi_file:
+            cur = conn.execute(
+                "INSERT INTO documenti (nome_file, tipo_documento, data_caricamento, stato) VALUES (?,?,?,?)",
+                (nome_file, tipo_documento, oggi, IN_CODA)
+            )
+            ids.append(cur.lastrowid)
+            indicizza_documento(conn, cur.lastrowid, nome_file, "")
+    return ids
+
+
+def segna_stato(conn, doc_id, stato, errore=None):
+    with conn:
+        conn.execute("UPDATE documenti SET stato = ?, errore = ? WHERE id = ?", (stato, errore, doc_id))
+
+
+def elabora_documento(conn, doc_id, nome_file, dati, base_dir=CARTELLA_ARCHIVIO):
+    """
+    Elaborazione completa di un documento registrato:
+    blob su disco (deduplicato per hash), righe/pagine, anteprima,
+    testo nell'indice full-text. Aggiorna lo stato a completato o errore.
+    """
+    segna_stato(conn, doc_id, IN_ELABORAZIONE)
+    try:
+        sha256 = salva_blob(dati, base_dir)
+        righe = conta_righe(nome_file, dati)
+        pagine = conta_pagine(nome_file, dati)
+        anteprima = crea_anteprima(nome_file, dati, os.path.join(percorsi(base_dir)["anteprime"], sha256 + ".png"))
+        # Estrazione del testo prima della transazione: l'UPDATE apre il lock di
+        # scrittura, che va tenuto solo per le due scritture brevi, altrimenti
+        # gli altri worker e la registrazione dei caricamenti restano in attesa
+        testo = testo_documento(conn, nome_file, sha256, base_dir)
+        with conn:
+            conn.execute(
+                """
+                UPDATE documenti SET sha256 = ?, dimensione = ?, righe = ?, pagine = ?,
+                anteprima = ?, stato = ?, errore = NULL WHERE id = ?
+                """,
+                (sha256, len(dati), righe, pagine, anteprima, COMPLETATO, doc_id)
+            )
+            # aggiornamento incrementale dell'indice: solo il documento nuovo
+            indicizza_documento(conn, doc_id, nome_file, testo)
+    except Exception as e:
+        segna_stato(conn, doc_id, ERRORE, str(e))
+        raise
+    tipo_documento = conn.execute("SELECT tipo_documento FROM documenti WHERE id = ?", (doc_id,)).fetchone()[0]
+    _scrivi_registro([{
+        "evento": "salvataggio",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "nome_file": nome_file,
+        "tipo_documento": tipo_documento,
+        "sha256": sha256,
+        "dimensione": len(dati),
+    }], base_dir)
+    return sha256
+
+
+# Salvataggio sincrono di più documenti (registrazione + elaborazione)
+# documenti → lista di tuple (nome_file, dati in bytes).
+def salva_documenti(conn, documenti, tipo_documento, base_dir=CARTELLA_ARCHIVIO):
+    ids = registra_caricamenti(conn, [nome for nome, _ in documenti], tipo_documento)
+    return [
+        elabora_documento(conn, doc_id, nome_file, dati, base_dir)
+        for doc_id, (nome_file, dati) in zip(ids, documenti)
+    ]
+
+
+def carica_documenti(conn):
+    """Elenco dei documenti archiviati, con le colonne mostrate nella pagina."""
+    return pd.read_sql_query(
+        """
+        SELECT nome_file AS "Nome File",
+               tipo_documento AS "Tipo Documento",
+               data_caricamento AS "Data Caricamento",
+               stato AS "Stato",
+               dimensione AS "Dimensione (byte)",
+               righe AS "Righe",
+               pagine AS "Pagine",
+               sha256 AS "SHA-256",
+               errore AS "Errore",
+               anteprima AS "Anteprima"
+        FROM documenti ORDER BY id
+        """,
+        conn
+    )
+
+
+# Le miniature sono indirizzate per hash e non cambiano mai: la cache evita di
+# rileggerle dal disco a ogni rerun
+@functools.lru_cache(maxsize=4096)
+def anteprima_data_uri(percorso):
+    """Miniatura PNG come data URI, il formato accettato da st.column_config.ImageColumn."""
+    try:
+        with open(percorso, "rb") as f:
+            return "data:image/png;base64," + base64.b64encode(f.read()).decode("ascii")
+    except OSError:
+        return None
+
+
+def conta_in_elaborazione(conn):
+    return conn.execute(
+        "SELECT COUNT(*) FROM documenti WHERE stato IN (?, ?)", (IN_CODA, IN_ELABORAZIONE)
+    ).fetchone()[0]
+
+
+def tipi_documento(conn):
+    return [r[0] for r in conn.execute("SELECT DISTINCT tipo_documento FROM documenti ORDER BY tipo_documento")]
+
+
+# --- Ricerca full-text
+
+def _testo_indicizzato(conn, sha256):
+    # Se lo stesso contenuto è già indicizzato riuso il testo estratto
+    riga = conn.execute(
+        """
+        SELECT f.testo FROM documenti_fts f JOIN documenti d ON d.id = f.rowid
+        WHERE d.sha256 = ? LIMIT 1
+        """,
+        (sha256,)
+    ).fetchone()
+    return None if riga is None else riga[0]
+
+
+def testo_documento(conn, nome_file, sha256, base_dir=CARTELLA_ARCHIVIO):
+    """Testo da indicizzare: riusato se il contenuto è già indicizzato, altrimenti estratto dal blob."""
+    testo = _testo_indicizzato(conn, sha256)
+    if testo is None:
+        testo = estrai_testo(nome_file, leggi_blob(sha256, base_dir))
+    return testo
+
+
+def indicizza_documento(conn, doc_id, nome_file, testo):
+    # OR REPLACE: un documento già indicizzato (es. da indicizza_mancanti) viene sovrascritto
+    conn.execute(
+        "INSERT OR REPLACE INTO documenti_fts (rowid, nome_file, testo) VALUES (?,?,?)",
+        (doc_id, nome_file, testo)
+    )
+
+
+def indicizza_mancanti(conn, base_dir=CARTELLA_ARCHIVIO):
+    """Indicizza i documenti archiviati prima che esistesse l'indice full-text."""
+    mancanti = conn.execute(
+        """
+        SELECT id, nome_file, sha256 FROM documenti
+        WHERE sha256 IS NOT NULL AND id NOT IN (SELECT rowid FROM documenti_fts)
+        """
+    ).fetchall()
+    # estrazione fuori dalla transazione, come in elabora_documento
+    testi = [(doc_id, nome_file, testo_documento(conn, nome_file, sha256, base_dir))
+             for doc_id, nome_file, sha256 in mancanti]
+    with conn:
+        for doc_id, nome_file, testo in testi:
+            indicizza_documento(conn, doc_id, nome_file, testo)
+
+
+def query_fts(testo):
+    """
+    Converte il testo digitato dall'utente in una query FTS5 sicura:
+    ogni parola diventa un termine tra virgolette con ricerca per prefisso,
+    così caratteri come - . : non vengono interpretati come operatori
+    (es. INV-001 → "INV-001"* trova la sequenza INV 001).
+    """
+    termini = [t.replace('"', '""') for t in testo.split()]
+    return " ".join(f'"{t}"*' for t in termini)
+
+
+def cerca_documenti(conn, testo, tipi=None, limite=500):
+    """
+    Ricerca ordinata per rilevanza (BM25) nel nome e nel contenuto dei documenti,
+    eventualmente limitata ad alcuni tipi di documento.
+    """
+    query = query_fts(testo)
+    filtro_tipo = ""
+    parametri = [query]
+    if tipi:
+        filtro_tipo = f"AND d.tipo_documento IN ({','.join('?' * len(tipi))})"
+        parametri.extend(tipi)
+    parametri.append(limite)
+    return pd.read_sql_query(
+        f"""
+        SELECT d.nome_file AS "Nome File",
+               d.tipo_documento AS "Tipo Documento",
+               d.data_caricamento AS "Data Caricamento",
+               d.stato AS "Stato",
+               d.dimensione AS "Dimensione (byte)",
+               d.righe AS "Righe",
+               d.pagine AS "Pagine",
+               d.sha256 AS "SHA-256",
+               snippet(documenti_fts, 1, '[', ']', '…', 12) AS "Estratto",
+               d.anteprima AS "Anteprima"
+        FROM documenti_fts f JOIN documenti d ON d.id = f.rowid
+        WHERE documenti_fts MATCH ? {filtro_tipo}
+        ORDER BY bm25(documenti_fts)
+        LIMIT ?
+        """,
+        conn,
+        params=parametri
+    )
@@ -0,0 +1,145 @@
+# benchmarks/__main__.py
+"""
+Esegue i benchmark e salva i risultati in JSON, confrontabili tra esecuzioni.
+
+Uso (dalla cartella del progetto):
+    python -m benchmarks                              # tutti i casi, tabella a video
+    python -m benchmarks --output risultati.json      # salva i risultati
+    python -m benchmarks --confronta base.json        # confronto con un'esecuzione precedente
+    python -m benchmarks --filtro fx_risk_app --scala 0.1 --ripetizioni 3
+
+Con --confronta il codice di uscita è 1 se almeno un caso è più lento
+della soglia (default 10% sulla mediana).
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.casi import CASI
+
+
+def misura(funzione, ripetizioni, riscaldamento=1):
+    for _ in range(riscaldamento):
+        funzione()
+    tempi = []
+    for _ in range(ripetizioni):
+        inizio = time.perf_counter()
+        funzione()
+        tempi.append(time.perf_counter() - inizio)
+    return tempi
+
+
+def commit_git():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def versioni_librerie():
+    versioni = {}
+    for nome in ("pandas", "numpy", "streamlit"):
+        try:
+            versioni[nome] = __import__(nome).__version__
+        except ImportError:
+            versioni[nome] = None
+    return versioni
+
+
+def silenzia_streamlit():
+    # Le funzioni con st.cache_data fuori da "streamlit run" avvisano a ogni chiamata
+    try:
+        from streamlit.logger import set_log_level
+    except ImportError:
+        return
+    set_log_level("error")
+
+
+def esegui(filtro=None, scala=1.0, ripetizioni=5):
+    silenzia_streamlit()
+    risultati = []
+    for nome, n_default, prepara in CASI:
+        if filtro and filtro not in nome:
+            continue
+        n = max(int(n_default * scala), 1)
+        with tempfile.TemporaryDirectory() as cartella:
+            funzione = prepara(n, cartella)
+            tempi = misura(funzione, ripetizioni)
+        risultato = {
+            "nome": nome,
+            "n": n,
+            "ripetizioni": ripetizioni,
+            "min_s": min(tempi),
+            "mediana_s": statistics.median(tempi),
+            "media_s": statistics.fmean(tempi),
+            "max_s": max(tempi),
+        }
+        print(f"{nome:<55} n={n:<9} mediana {risultato['mediana_s'] * 1000:10.2f} ms", flush=True)
+        risultati.append(risultato)
+    return {
+        "versione_formato": 1,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit_git(),
+        "python": sys.version.split()[0],
+        "piattaforma": platform.platform(),
+        "librerie": versioni_librerie(),
+        "scala": scala,
+        "risultati": risultati,
+    }
+
+
+# Confronto tra due esecuzioni: rapporto tra le mediane dei casi presenti in entrambe
+def confronta(base, attuale, soglia):
+    per_nome = {(r["nome"], r["n"]): r for r in base["risultati"]}
+    regressioni = []
+    print(f"\nConfronto con {base.get('commit') or 'base'} del {base.get('timestamp')}:")
+    for r in attuale["risultati"]:
+        b = per_nome.get((r["nome"], r["n"]))
+        if b is None:
+            print(f"{r['nome']:<55} (nuovo caso o n diverso)")
+            continue
+        rapporto = r["mediana_s"] / b["mediana_s"]
+        esito = ""
+        if rapporto > 1 + soglia:
+            esito = "PIÙ LENTO"
+            regressioni.append(r["nome"])
+        elif rapporto < 1 - soglia:
+            esito = "più veloce"
+        print(f"{r['nome']:<55} {b['mediana_s'] * 1000:10.2f} → {r['mediana_s'] * 1000:10.2f} ms  x{rapporto:5.2f} {esito}")
+    return regressioni
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark dei percorsi critici dell'hub")
+    parser.add_argument("--filtro", help="esegue solo i casi il cui nome contiene questo testo")
+    parser.add_argument("--scala", type=float, default=1.0, help="moltiplicatore delle dimensioni dei dati (default 1.0)")
+    parser.add_argument("--ripetizioni", type=int, default=5, help="ripetizioni misurate per caso (default 5)")
+    parser.add_argument("--output", help="file JSON in cui salvare i risultati")
+    parser.add_argument("--confronta", help="file JSON di un'esecuzione precedente da confrontare")
+    parser.add_argument("--soglia", type=float, default=0.10, help="rallentamento tollerato nel confronto (default 0.10)")
+    args = parser.parse_args(argv)
+
+    attuale = esegui(args.filtro, args.scala, args.ripetizioni)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(attuale, f, indent=2)
+        print(f"\nRisultati salvati in {args.output}")
+
+    if args.confronta:
+        with open(args.confronta, encoding="utf-8") as f:
+            base = json.load(f)
+        if confronta(base, attuale, args.soglia):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
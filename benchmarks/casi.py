@@ -0,0 +1,204 @@
+# benchmarks/casi.py
+"""
+Casi di benchmark sui percorsi critici delle pagine dell'hub.
+Ogni caso riceve il numero di righe n e una cartella temporanea, prepara i dati
+(fuori dalla misura) e restituisce la funzione da cronometrare.
+Si chiamano direttamente le funzioni dei moduli: non serve un server Streamlit.
+"""
+
+import os
+
+import numpy as np
+
+from benchmarks import generatori
+
+# Registro dei casi: (nome, n di default, funzione di preparazione)
+CASI = []
+
+
+def caso(nome, n):
+    def registra(prepara):
+        CASI.append((nome, n, prepara))
+        return prepara
+    return registra
+
+
+# --- fx_risk_app
+
+@caso("fx_risk_app.add_base_amount[booking]", 100_000)
+def _add_base_amount_booking(n, cartella):
+    from fx_risk_app import add_base_amount
+    df = generatori.genera_fatture_fx(n)
+    return lambda: add_base_amount(df, "CHF", {})
+
+
+@caso("fx_risk_app.add_base_amount[mapping]", 100_000)
+def _add_base_amount_mapping(n, cartella):
+    from fx_risk_app import add_base_amount
+    df = generatori.genera_fatture_fx(n, con_tasso_booking=False)
+    return lambda: add_base_amount(df, "CHF", generatori.TASSI_INDICATIVI)
+
+
+@caso("fx_risk_app.group_exposure[M]", 100_000)
+def _group_exposure_mese(n, cartella):
+    from fx_risk_app import add_base_amount, group_exposure
+    df = add_base_amount(generatori.genera_fatture_fx(n), "CHF", {})
+    return lambda: group_exposure(df, "M")
+
+
+@caso("fx_risk_app.group_exposure[Q]", 100_000)
+def _group_exposure_trimestre(n, cartella):
+    from fx_risk_app import add_base_amount, group_exposure
+    df = add_base_amount(generatori.genera_fatture_fx(n), "CHF", {})
+    return lambda: group_exposure(df, "Q")
+
+
+@caso("fx_risk_app.simulate_shocks[3 shock]", 20_000)
+def _simulate_shocks(n, cartella):
+    from fx_risk_app import add_base_amount, simulate_shocks
+    df = add_base_amount(generatori.genera_fatture_fx(n), "CHF", {})
+    return lambda: simulate_shocks(df, 50, {"USD": 0.9}, [-0.1, 0.0, 0.1], "CHF")
+
+
+@caso("fx_risk_app.monte_carlo[200 simulazioni]", 1_000)
+def _monte_carlo(n, cartella):
+    from fx_risk_app import add_base_amount, monte_carlo
+    df = add_base_amount(generatori.genera_fatture_fx(n), "CHF", {})
+    shocks = np.random.default_rng(42).normal(0.0, 0.06, 200)
+    return lambda: monte_carlo(df, 50, {"USD": 0.9}, shocks, "CHF")
+
+
+# --- riconciliazione_doganale
+
+@caso("riconciliazione_doganale.riconcilia", 50_000)
+def _riconcilia(n, cartella):
+    from riconciliazione_doganale import riconcilia
+    fatture, dogane = generatori.genera_riconciliazione(n)
+    # riconcilia aggiunge Valore_CHF ai DataFrame: ogni ripetizione parte da una copia
+    return lambda: riconcilia(fatture.copy(), dogane.copy())
+
+
+@caso("riconciliazione_doganale.highlight_discrepancy[styling]", 2_000)
+def _styling(n, cartella):
+    from riconciliazione_doganale import riconcilia, highlight_discrepancy
+    merged = riconcilia(*generatori.genera_riconciliazione(n))
+    # lo Styler è pigro: to_html forza il calcolo degli stili come fa st.dataframe
+    return lambda: merged.style.apply(highlight_discrepancy, axis=1).to_html()
+
+
+# --- partita_doppia
+
+@caso("partita_doppia.registra_scrittura", 1_000)
+def _registra_scrittura(n, cartella):
+    from partita_doppia import init_db, registra_scrittura
+    conn = init_db(os.path.join(cartella, "partita_doppia.db"))
+    operazioni = generatori.genera_scritture(n)
+
+    def esegui():
+        for data, tipo, righe, descrizione in operazioni:
+            registra_scrittura(conn, data, tipo, righe, descrizione)
+    return esegui
+
+
+@caso("partita_doppia.leggi_scritture", 100_000)
+def _leggi_scritture(n, cartella):
+    from partita_doppia import init_db, leggi_scritture
+    conn = init_db(os.path.join(cartella, "partita_doppia.db"))
+    with conn:
+        conn.executemany(
+            "INSERT INTO scritture (data, tipo, conto_dare, conto_avere, importo, descrizione) VALUES (?,?,?,?,?,?)",
+            [(data, tipo, dare, avere, importo, descrizione)
+             for data, tipo, righe, descrizione in generatori.genera_scritture(n)
+             for dare, avere, importo in righe]
+        )
+    return lambda: leggi_scritture(conn)
+
+
+# --- gestione_documentale
+
+def _archivio_con_documenti(n, cartella):
+    from archivio_documenti import init_archivio, salva_documenti
+    base_dir = os.path.join(cartella, "archivio")
+    conn = init_archivio(base_dir)
+    documenti = generatori.genera_documenti(n)
+    meta = len(documenti) // 2
+    salva_documenti(conn, documenti[:meta], "Fattura", base_dir)
+    salva_documenti(conn, documenti[meta:], "Dogana", base_dir)
+    return conn
+
+
+@caso("gestione_documentale.filtra_documenti[tipo]", 10_000)
+def _filtro_tipo(n, cartella):
+    from gestione_documentale import filtra_documenti
+    conn = _archivio_con_documenti(n, cartella)
+    return lambda: filtra_documenti(conn, "", ["Fattura"])
+
+
+@caso("gestione_documentale.filtra_documenti[testo+tipo]", 10_000)
+def _filtro_testo(n, cartella):
+    from gestione_documentale import filtra_documenti
+    conn = _archivio_con_documenti(n, cartella)
+    return lambda: filtra_documenti(conn, "Cliente12", ["Fattura"])
+
+
+# --- dashboard_cambi
+
+@caso("dashboard_cambi.margine_griglia[N×N]", 500)
+def _margine_griglia(n, cartella):
+    from dashboard_cambi import margine_griglia
+    variazioni = np.linspace(-0.2, 0.2, n)
+    return lambda: margine_griglia(50_000, 80_000, 0.95, 1.10, variazioni, variazioni)
+
+
+@caso("dashboard_cambi.deal_book[caricamento]", 100_000)
+def _deal_book_caricamento(n, cartella):
+    from dashboard_cambi import carica_deal_book, sintesi_per_valuta, candidati_sensibili
+    dati = generatori.genera_deal_book(n).to_csv(index=False).encode("utf-8")
+
+    def esegui():
+        # senza cache: misura il costo di un nuovo file
+        for funzione in (carica_deal_book, sintesi_per_valuta, candidati_sensibili):
+            funzione.clear()
+        sintesi_per_valuta(dati, "deal_book.csv")
+        candidati_sensibili(dati, "deal_book.csv", 20)
+    return esegui
+
+
+@caso("dashboard_cambi.deal_book[cambio tasso]", 100_000)
+def _deal_book_cambio_tasso(n, cartella):
+    from dashboard_cambi import (sintesi_per_valuta, candidati_sensibili, margine_per_valuta,
+                                 impatto_scenari, operazioni_sensibili)
+    dati = generatori.genera_deal_book(n).to_csv(index=False).encode("utf-8")
+    sintesi_per_valuta(dati, "deal_book.csv")
+    candidati_sensibili(dati, "deal_book.csv", 20)
+    tassi = {"CHF": 1.0, "EUR": 0.95, "USD": 1.10, "GBP": 0.88, "JPY": 170.0}
+
+    def esegui():
+        # rerun dopo la modifica di un tasso: le parti che dipendono dal file sono in cache
+        sintesi = sintesi_per_valuta(dati, "deal_book.csv")
+        candidati = candidati_sensibili(dati, "deal_book.csv", 20)
+        margini = margine_per_valuta(sintesi, tassi)
+        impatto_scenari(margini, [-0.05, 0.0, 0.05])
+        operazioni_sensibili(candidati, tassi, 0.05, 20)
+    return esegui
+
+
+# --- tassi_storici
+
+@caso("tassi_storici.converti_in_chf[as-of]", 1_000_000)
+def _converti_asof(n, cartella):
+    from tassi_storici import converti_in_chf
+    tassi = generatori.genera_tassi()
+    fatture = generatori.genera_fatture_fx(n)
+    return lambda: converti_in_chf(fatture["amount_foreign"], fatture["currency"], fatture["date"], tassi)
+
+
+@caso("riconciliazione_doganale.riconcilia[tassi storici]", 50_000)
+def _riconcilia_storico(n, cartella):
+    from riconciliazione_doganale import riconcilia
+    tassi = generatori.genera_tassi()
+    fatture, dogane = generatori.genera_riconciliazione(n)
+    rng = np.random.default_rng(1)
+    fatture["Data"] = generatori._date(rng, len(fatture))
+    dogane["Data"] = generatori._date(rng, len(dogane))
+    return lambda: riconcilia(fatture.copy(), dogane.copy(), tassi)
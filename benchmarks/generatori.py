@@ -0,0 +1,118 @@
+# benchmarks/generatori.py
+"""
+Generatori di dati sintetici per i benchmark, scalabili con il numero di righe.
+Ogni generatore è deterministico a parità di seed, così i risultati di due
+esecuzioni sono confrontabili.
+"""
+
+import numpy as np
+import pandas as pd
+
+VALUTE = ["CHF", "EUR", "USD", "GBP", "JPY"]
+# tasso indicativo per 1 unità di valuta estera, solo per avere ordini di grandezza realistici
+TASSI_INDICATIVI = {"CHF": 1.0, "EUR": 0.95, "USD": 0.88, "GBP": 1.12, "JPY": 0.0059}
+
+
+def _date(rng, n, inizio="2024-01-01", giorni=730):
+    return pd.Timestamp(inizio) + pd.to_timedelta(rng.integers(0, giorni, n), unit="D")
+
+
+# Fatture in valuta estera nel formato di fx_risk_app
+def genera_fatture_fx(n, seed=0, con_tasso_booking=True):
+    rng = np.random.default_rng(seed)
+    valute = rng.choice(VALUTE[1:], n)
+    df = pd.DataFrame({
+        "invoice_id": [f"INV-{i:07d}" for i in range(n)],
+        "date": _date(rng, n),
+        "currency": valute,
+        "amount_foreign": rng.uniform(100, 500_000, n).round(2),
+        "description": rng.choice(["macchinario", "componenti", "materiale", "spese"], n),
+    })
+    if con_tasso_booking:
+        base = pd.Series(valute).map(TASSI_INDICATIVI).to_numpy()
+        df["fx_rate_at_booking"] = (base * rng.normal(1.0, 0.03, n)).round(6)
+    return df
+
+
+# Fatture e dichiarazioni doganali nel formato di riconciliazione_doganale.
+# quota_mancanti: frazione di documenti presenti in un solo file
+# quota_discrepanze: frazione di documenti con valore diverso tra i due file
+def genera_riconciliazione(n, seed=0, quota_mancanti=0.05, quota_discrepanze=0.1):
+    rng = np.random.default_rng(seed)
+    numeri = np.array([f"F{i:07d}" for i in range(n)])
+    valute = rng.choice(["CHF", "EUR", "USD"], n)
+    valori = rng.integers(100, 100_000, n).astype(float)
+    fatture = pd.DataFrame({
+        "NumeroDocumento": numeri,
+        "Cliente": [f"Cliente{c}" for c in rng.integers(0, max(n // 20, 1), n)],
+        "Valore": valori,
+        "Valuta": valute,
+    })
+    discrepanza = rng.random(n) < quota_discrepanze
+    dogane = pd.DataFrame({
+        "NumeroDocumento": numeri,
+        "Paese": rng.choice(["CH", "DE", "IT", "US"], n),
+        "Valore": np.where(discrepanza, valori * rng.uniform(0.9, 1.1, n).round(2), valori),
+        "Valuta": valute,
+    })
+    # togli alcuni documenti da un file o dall'altro
+    mancanti = rng.random(n) < quota_mancanti
+    solo_fatture = mancanti & (rng.random(n) < 0.5)
+    solo_dogane = mancanti & ~solo_fatture
+    return fatture[~solo_dogane].reset_index(drop=True), dogane[~solo_fatture].reset_index(drop=True)
+
+
+# Operazioni contabili per partita_doppia.registra_scrittura: (data, tipo, righe, descrizione)
+def genera_scritture(n, seed=0):
+    rng = np.random.default_rng(seed)
+    schemi = {
+        "Acquisto estero": lambda x: [("Merci", "Debiti fornitori esteri", x)],
+        "Spese doganali": lambda x: [("Spese doganali", "Debiti dogana", x * 0.7),
+                                     ("IVA a credito", "Debiti dogana", x * 0.3)],
+        "Vendita estero": lambda x: [("Crediti clienti esteri", "Ricavi export", x)],
+        "Commissioni bancarie": lambda x: [("Spese bancarie", "Banca", x)],
+    }
+    tipi = rng.choice(list(schemi), n)
+    importi = rng.uniform(10, 50_000, n).round(2)
+    date = _date(rng, n).strftime("%Y-%m-%d")
+    return [
+        (data, tipo, schemi[tipo](float(importo)), f"Operazione {i}")
+        for i, (data, tipo, importo) in enumerate(zip(date, tipi, importi))
+    ]
+
+
+# Deal book nel formato di dashboard_cambi
+def genera_deal_book(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "IdOperazione": [f"OP-{i:07d}" for i in range(n)],
+        "Data": _date(rng, n),
+        "Tipo": rng.choice(["Import", "Export"], n),
+        "Valuta": rng.choice(VALUTE, n, p=[0.1, 0.4, 0.35, 0.1, 0.05]),
+        "Importo": rng.uniform(500, 1_000_000, n).round(2),
+    })
+
+
+# Documenti per gestione_documentale: lista di (nome_file, bytes) CSV piccoli
+def genera_documenti(n, seed=0):
+    rng = np.random.default_rng(seed)
+    documenti = []
+    for i in range(n):
+        hs = rng.integers(1000, 9999)
+        cliente = rng.integers(0, max(n // 10, 1))
+        testo = (f"NumeroDocumento,Cliente,CodiceHS,Valore\n"
+                 f"INV-{i:07d},Cliente{cliente},{hs}.{rng.integers(10, 99)},{rng.integers(100, 100_000)}\n")
+        documenti.append((f"fattura_{i:07d}.csv", testo.encode("utf-8")))
+    return documenti
+
+
+# Serie storica giornaliera dei tassi nel formato di tassi_storici (unità di valuta per 1 CHF)
+def genera_tassi(giorni=730, seed=0):
+    rng = np.random.default_rng(seed)
+    date = pd.date_range("2024-01-01", periods=giorni, freq="D")
+    serie = []
+    for valuta in VALUTE[1:]:
+        # passeggiata casuale attorno al tasso indicativo
+        livello = (1 / TASSI_INDICATIVI[valuta]) * np.exp(np.cumsum(rng.normal(0, 0.004, giorni)))
+        serie.append(pd.DataFrame({"Data": date, "Valuta": valuta, "Tasso": livello}))
+    return pd.concat(serie, ignore_index=True).sort_values("Data", kind="stable").reset_index(drop=True)
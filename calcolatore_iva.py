@@ -1,6 +1,8 @@
 import streamlit as st
 import requests
 
+from strumentazione import misura
+
 def main():
     # Aliquote IVA Svizzera (2024)
     VAT_RATES = {
@@ -17,11 +19,14 @@ def main():
         if response.status_code == 200 and response.json()["success"] != False:
             return response.json()["rates"]
         else:
-            st.warning("Impossibile recuperare i tassi di cambio. Uso valori fissi di default.")
-            return {"EUR": 0.95, "USD": 0.88, "CHF": 1.0}  # fallback valori
+            st.warning("Impossibile recuperare i tassi di cambio. Uso gli ultimi tassi dell'archivio storico.")
+            # import solo qui: tassi_storici usa pandas, che la pagina altrimenti non carica
+            from tassi_storici import carica_tassi, ultimi_tassi
+            return ultimi_tassi(carica_tassi())  # fallback valori
 
     def calcola_importo_con_iva(valore, valuta, categoria):
-        rates = get_exchange_rates()
+        with misura("get_exchange_rates"):
+            rates = get_exchange_rates()
 
         # Conversione in CHF
         if valuta != "CHF":
@@ -1,9 +1,211 @@
 # dashboard_cambi.py
+import io
 import streamlit as st
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
+from strumentazione import misura, strumentato
+
+
+# Margine su una griglia di variazioni indipendenti di CHF → EUR (colonne) e CHF → USD (righe).
+# Il margine è separabile: ricavo(USD) - costo(EUR), quindi basta calcolare due
+# vettori 1D e combinarli con un unico broadcast NumPy (N×M in un solo passaggio).
+@strumentato()
+def margine_griglia(costo_import_eur, ricavo_export_usd, chf_eur, chf_usd, var_eur, var_usd):
+    costo_chf = costo_import_eur / (chf_eur * (1 + np.asarray(var_eur)))
+    ricavo_chf = ricavo_export_usd / (chf_usd * (1 + np.asarray(var_usd)))
+    return ricavo_chf[:, None] - costo_chf[None, :]
+
+
+def grafico_griglia(margini, var_eur, var_usd):
+    # imshow disegna la matrice come immagine: resta veloce anche con 500×500 celle
+    fig, ax = plt.subplots()
+    estensione = [var_eur[0] * 100, var_eur[-1] * 100, var_usd[0] * 100, var_usd[-1] * 100]
+    limite = np.abs(margini).max()
+    img = ax.imshow(margini, origin="lower", extent=estensione, aspect="auto",
+                    cmap="RdYlGn", vmin=-limite, vmax=limite)
+    fig.colorbar(img, ax=ax, label="Margine (CHF)")
+    # Curva di pareggio (margine = 0), se cade dentro la griglia
+    if margini.min() < 0 < margini.max():
+        ax.contour(var_eur * 100, var_usd * 100, margini, levels=[0], colors="black", linewidths=1.5)
+        ax.plot([], [], color="black", label="Pareggio (margine = 0)")
+        ax.legend(loc="upper right")
+    ax.axhline(0, color="grey", linewidth=0.5)
+    ax.axvline(0, color="grey", linewidth=0.5)
+    ax.set_xlabel("Variazione CHF → EUR (%)")
+    ax.set_ylabel("Variazione CHF → USD (%)")
+    ax.set_title("Sensibilità del margine a EUR e USD")
+    return fig
+
+
+# --- Deal book
+# File con migliaia di operazioni, ognuna con valuta, importo e data propri.
+# Tassi espressi come nei campi della sidebar: unità di valuta per 1 CHF.
+COLONNE_DEAL_BOOK = ["IdOperazione", "Data", "Tipo", "Valuta", "Importo"]
+
+DEAL_BOOK_ESEMPIO = """IdOperazione,Data,Tipo,Valuta,Importo
+OP-001,2025-01-15,Import,EUR,50000
+OP-002,2025-01-20,Export,USD,80000
+OP-003,2025-02-03,Import,USD,12000
+OP-004,2025-02-10,Export,EUR,30000
+OP-005,2025-03-01,Export,GBP,15000
+"""
+
+
+# Lettura e validazione: dipende solo dal file, quindi resta in cache
+# finché non si carica un file diverso (i cambi dei tassi non la ricalcolano).
+@st.cache_data(show_spinner=False)
+def carica_deal_book(dati, nome_file):
+    if nome_file.lower().endswith(".csv"):
+        df = pd.read_csv(io.BytesIO(dati))
+    else:
+        df = pd.read_excel(io.BytesIO(dati))
+    mancanti = [c for c in COLONNE_DEAL_BOOK if c not in df.columns]
+    if mancanti:
+        raise ValueError(f"Deal book: colonne mancanti {', '.join(mancanti)}")
+    df["Data"] = pd.to_datetime(df["Data"])
+    df["Valuta"] = df["Valuta"].astype("string").str.upper().str.strip()
+    tipo = df["Tipo"].str.lower().str.strip()
+    if not tipo.isin(["import", "export"]).all():
+        raise ValueError("Deal book: la colonna Tipo deve contenere solo Import o Export")
+    # Una valuta vuota sparirebbe dal groupby delle somme per valuta:
+    # meglio rifiutare il file che mostrare totali senza quelle operazioni
+    if (df["Valuta"].isna() | (df["Valuta"] == "")).any():
+        raise ValueError("Deal book: la colonna Valuta non può avere celle vuote")
+    importo = pd.to_numeric(df["Importo"], errors="coerce")
+    if importo.isna().any():
+        raise ValueError("Deal book: la colonna Importo deve contenere solo numeri, senza celle vuote")
+    # Export = ricavo (+), Import = costo (-): il margine è la somma degli importi con segno
+    df["Importo_segnato"] = np.where(tipo == "export", 1.0, -1.0) * importo.astype(float)
+    return df
+
+
+# Somme per valuta: con k valute il margine totale è
+#   Σ_k netto_k / tasso_k
+# quindi al cambio di un tasso si ricalcolano k righe, non migliaia di operazioni.
+@st.cache_data(show_spinner=False)
+def sintesi_per_valuta(dati, nome_file):
+    df = carica_deal_book(dati, nome_file)
+    return df.groupby("Valuta").agg(
+        Operazioni=("Importo", "size"),
+        Import=("Importo_segnato", lambda x: -x[x < 0].sum()),
+        Export=("Importo_segnato", lambda x: x[x > 0].sum()),
+        Netto=("Importo_segnato", "sum"),
+    )
+
+
+# Candidati per la classifica di sensibilità: l'impatto di uno shock su un'operazione
+# è proporzionale a |importo| / tasso della sua valuta, quindi le top-N complessive
+# sono sempre tra le top-N di ciascuna valuta (indipendentemente dai tassi).
+@st.cache_data(show_spinner=False)
+def candidati_sensibili(dati, nome_file, n):
+    df = carica_deal_book(dati, nome_file)
+    df = df[df["Valuta"] != "CHF"]
+    ordine = df["Importo_segnato"].abs().groupby(df["Valuta"]).nlargest(n).index.get_level_values(-1)
+    return df.loc[ordine]
+
+
+def tassi_mancanti(valute, tassi):
+    return [v for v in valute if v not in tassi]
+
+
+def margine_per_valuta(sintesi, tassi):
+    tasso = sintesi.index.map(tassi).to_numpy(dtype=float)
+    out = sintesi.copy()
+    out["Tasso CHF →"] = tasso
+    out["Import CHF"] = sintesi["Import"] / tasso
+    out["Export CHF"] = sintesi["Export"] / tasso
+    out["Margine CHF"] = sintesi["Netto"] / tasso
+    return out
+
+
+def impatto_scenari(margini_valuta, variazioni):
+    # Stessa variazione su tutti i tassi (come lo scenario singolo): le operazioni
+    # in valuta estera valgono margine / (1 + delta), quelle in CHF non cambiano.
+    # Per valuta: impatto della variazione solo su quella valuta.
+    # Con variazione 0 gli scenari -0%, 0%, +0% coincidono: senza duplicati
+    # (+ 0.0 trasforma -0.0 in 0.0) le colonne per valuta hanno nomi distinti
+    variazioni = np.unique(np.asarray(variazioni, dtype=float) + 0.0)
+    margine = margini_valuta["Margine CHF"].to_numpy()
+    estera = np.asarray(margini_valuta.index != "CHF")
+    totale = margine[~estera].sum() + margine[estera].sum() / (1 + variazioni)
+    per_valuta = pd.DataFrame(
+        np.where(estera[:, None], margine[:, None] * (1 / (1 + variazioni)[None, :] - 1), 0.0),
+        index=margini_valuta.index,
+        columns=[f"{v:+.0%}" for v in variazioni],
+    )
+    return pd.DataFrame({"Scenario": [f"{v:+.0%}" for v in variazioni], "Margine CHF": totale}), per_valuta
+
+
+def operazioni_sensibili(candidati, tassi, variazione, n):
+    # Impatto sul margine CHF di una variazione del tasso della valuta dell'operazione
+    df = candidati.copy()
+    df["Margine CHF"] = df["Importo_segnato"] / df["Valuta"].map(tassi)
+    df["Impatto CHF"] = df["Margine CHF"] * (1 / (1 + variazione) - 1)
+    return df.loc[df["Impatto CHF"].abs().nlargest(n).index, COLONNE_DEAL_BOOK + ["Margine CHF", "Impatto CHF"]]
+
+
+def deal_book(chf_eur, chf_usd):
+    st.subheader("📚 Deal book")
+    file = st.file_uploader("Carica il deal book (CSV/Excel)", type=["csv", "xlsx"])
+    st.download_button("Scarica template deal book", DEAL_BOOK_ESEMPIO, "deal_book_template.csv", "text/csv")
+    if file is None:
+        st.info("Usando deal book di esempio. Colonne richieste: " + ", ".join(COLONNE_DEAL_BOOK))
+        dati, nome_file = DEAL_BOOK_ESEMPIO.encode("utf-8"), "esempio.csv"
+    else:
+        dati, nome_file = file.getvalue(), file.name
+
+    try:
+        with misura("carica_deal_book"):
+            df = carica_deal_book(dati, nome_file)
+    except Exception as e:
+        st.error(str(e))
+        return
+    with misura("sintesi_per_valuta"):
+        sintesi = sintesi_per_valuta(dati, nome_file)
+
+    # Tassi: EUR e USD dalla sidebar, le altre valute presenti nel file da input dedicati
+    tassi = {"CHF": 1.0, "EUR": chf_eur, "USD": chf_usd}
+    altre = tassi_mancanti(sintesi.index, tassi)
+    if altre:
+        st.sidebar.header("Altre valute del deal book")
+        for valuta in altre:
+            tassi[valuta] = st.sidebar.number_input(f"CHF → {valuta}", value=1.0, step=0.01, key=f"deal_{valuta}")
+
+    st.sidebar.header("📈 Scenario Planning")
+    variazione = st.sidebar.slider("Variazione cambio (%)", min_value=-20, max_value=20, value=5, step=1)
+    top_n = st.sidebar.number_input("Operazioni più sensibili (top N)", min_value=1, max_value=500, value=20, step=5)
+
+    margini_valuta = margine_per_valuta(sintesi, tassi)
+    st.subheader("📊 Risultati attuali")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Costo Import in CHF", f"{margini_valuta['Import CHF'].sum():,.2f} CHF")
+    col2.metric("Ricavo Export in CHF", f"{margini_valuta['Export CHF'].sum():,.2f} CHF")
+    col3.metric("Margine", f"{margini_valuta['Margine CHF'].sum():,.2f} CHF")
+    st.write(f"{len(df):,} operazioni in {len(sintesi)} valute")
+    st.dataframe(margini_valuta)
+
+    st.subheader(f"🔮 Scenario con variazione ±{variazione}%")
+    df_scenari, per_valuta = impatto_scenari(margini_valuta, [-variazione/100, 0, variazione/100])
+    st.dataframe(df_scenari)
+    st.write("Impatto sul margine (CHF) di una variazione della sola valuta:")
+    st.dataframe(per_valuta)
+
+    st.subheader(f"🎯 Le {int(top_n)} operazioni più sensibili a una variazione del {variazione:+d}%")
+    with misura("operazioni_sensibili"):
+        candidati = candidati_sensibili(dati, nome_file, int(top_n))
+        st.dataframe(operazioni_sensibili(candidati, tassi, variazione/100, int(top_n)))
+
+    # Dettaglio completo: colonne calcolate su tutto il deal book in un'unica operazione vettoriale
+    if st.checkbox("Mostra margine per operazione"):
+        dettaglio = df[COLONNE_DEAL_BOOK].copy()
+        dettaglio["Margine CHF"] = df["Importo_segnato"] / df["Valuta"].map(tassi)
+        st.dataframe(dettaglio)
+        st.download_button("⬇️ Scarica margini per operazione", dettaglio.to_csv(index=False).encode("utf-8"),
+                           "deal_book_margini.csv", "text/csv")
+
+
 def main():
     st.title("💱 Dashboard Cambi & Margini Import-Export")
 
@@ -12,6 +214,11 @@ def main():
     chf_eur = st.sidebar.number_input("CHF → EUR", value=0.95, step=0.01)
     chf_usd = st.sidebar.number_input("CHF → USD", value=1.10, step=0.01)
 
+    modalita = st.sidebar.radio("Modalità", ["Operazione singola", "Deal book"])
+    if modalita == "Deal book":
+        deal_book(chf_eur, chf_usd)
+        return
+
     # --- Input costi & ricavi
     st.sidebar.header("Dati aziendali")
     costo_import_eur = st.sidebar.number_input("Costo import (EUR)", value=50000, step=1000)
@@ -20,6 +227,7 @@ def main():
      # --- Slider per variazione cambio
     st.sidebar.header("📈 Scenario Planning")
     variazione = st.sidebar.slider("Variazione cambio (%)", min_value=-20, max_value=20, value=5, step=1)
+    griglia = st.sidebar.checkbox("Griglia di sensibilità EUR/USD", value=False)
 
     # --- Conversione in CHF
     costo_import_chf = costo_import_eur / chf_eur
@@ -49,11 +257,46 @@ def main():
 
     # --- Grafico scenari
     # Creiamo un grafico a barre con Scenario sull’asse X e Margine in CHF sull’asse Y.
-    fig, ax = plt.subplots()
-    ax.bar(df_scenari["Scenario"], df_scenari["Margine CHF"], color="skyblue")
-    ax.set_ylabel("Margine (CHF)")
-    ax.set_title("Impatto variazione cambio sul margine")
-    st.pyplot(fig)
+    with misura("grafico scenari"):
+        fig, ax = plt.subplots()
+        ax.bar(df_scenari["Scenario"], df_scenari["Margine CHF"], color="skyblue")
+        ax.set_ylabel("Margine (CHF)")
+        ax.set_title("Impatto variazione cambio sul margine")
+        st.pyplot(fig)
+        # pyplot tiene ogni figura aperta finché non viene chiusa: senza close
+        # ogni rerun ne aggiungerebbe una in memoria
+        plt.close(fig)
+
+    # --- Griglia di sensibilità
+    # EUR e USD si muovono in modo indipendente: il margine viene calcolato su tutte
+    # le combinazioni di variazioni e mostrato come mappa di calore con la curva di pareggio.
+    if griglia:
+        st.subheader("🗺️ Sensibilità del margine a EUR e USD")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            ampiezza = st.slider("Ampiezza variazioni (±%)", min_value=1, max_value=50, value=20, step=1)
+        with col2:
+            punti_eur = st.number_input("Punti griglia EUR", min_value=2, max_value=1000, value=200, step=50)
+        with col3:
+            punti_usd = st.number_input("Punti griglia USD", min_value=2, max_value=1000, value=200, step=50)
+
+        var_eur = np.linspace(-ampiezza / 100, ampiezza / 100, int(punti_eur))
+        var_usd = np.linspace(-ampiezza / 100, ampiezza / 100, int(punti_usd))
+        margini = margine_griglia(costo_import_eur, ricavo_export_usd, chf_eur, chf_usd, var_eur, var_usd)
+
+        with misura("grafico griglia"):
+            fig = grafico_griglia(margini, var_eur, var_usd)
+            st.pyplot(fig)
+            plt.close(fig)
+
+        # Combinazioni estreme della griglia
+        i_min, j_min = np.unravel_index(margini.argmin(), margini.shape)
+        i_max, j_max = np.unravel_index(margini.argmax(), margini.shape)
+        st.write(f"**Margine minimo:** {margini[i_min, j_min]:,.2f} CHF "
+                 f"(EUR {var_eur[j_min]:+.1%}, USD {var_usd[i_min]:+.1%})")
+        st.write(f"**Margine massimo:** {margini[i_max, j_max]:,.2f} CHF "
+                 f"(EUR {var_eur[j_max]:+.1%}, USD {var_usd[i_max]:+.1%})")
+        st.write(f"**Scenari in perdita:** {(margini < 0).mean():.1%} della griglia")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,130 @@
+# elaborazione_documenti.py
+"""
+Elaborazione dei documenti in background.
+- Il salvataggio registra solo i documenti (stato "in coda") e ritorna subito.
+- Un pool limitato di thread elabora la coda: hash e blob su disco, testo per
+  la ricerca, righe/pagine, anteprime (vedi archivio_documenti.elabora_documento).
+- Ogni thread usa la propria connessione SQLite; lo stato di ogni documento è
+  visibile nella tabella della pagina.
+- I dati caricati non restano in memoria in attesa del worker: al momento
+  dell'accodamento vengono scritti in archivio/coda/<id> e il lavoro li rilegge
+  da lì, così anche centinaia di file in coda occupano solo disco.
+  Al riavvio dell'app i documenti rimasti in coda vengono ripresi.
+
+Si usano thread e non processi: hashlib, zlib (PNG/XLSX) e SQLite rilasciano
+il GIL, e i dati caricati non vanno copiati in un altro processo.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from archivio_documenti import (
+    CARTELLA_ARCHIVIO, IN_CODA, IN_ELABORAZIONE, ERRORE,
+    connetti, elabora_documento, percorsi, registra_caricamenti,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKER = min(4, os.cpu_count() or 1)
+
+# Il modulo resta in memoria tra un rerun e l'altro di Streamlit,
+# quindi pool e connessioni per thread sono condivisi da tutte le sessioni.
+_pool = None
+_lock_pool = threading.Lock()
+_locale = threading.local()
+
+
+def _connessione(base_dir):
+    # una connessione per thread worker (e per archivio), riusata tra i lavori
+    connessioni = getattr(_locale, "connessioni", None)
+    if connessioni is None:
+        connessioni = _locale.connessioni = {}
+    if base_dir not in connessioni:
+        connessioni[base_dir] = connetti(base_dir)
+    return connessioni[base_dir]
+
+
+def percorso_coda(doc_id, base_dir=CARTELLA_ARCHIVIO):
+    return os.path.join(percorsi(base_dir)["coda"], str(doc_id))
+
+
+def _scrivi_coda(doc_id, dati, base_dir):
+    # file temporaneo + os.replace come per i blob: un file in coda è sempre completo
+    cartella = percorsi(base_dir)["coda"]
+    os.makedirs(cartella, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cartella)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(dati)
+        os.replace(tmp, percorso_coda(doc_id, base_dir))
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _orfani(base_dir):
+    """
+    Documenti rimasti in coda da un processo precedente (riavvio dell'app).
+    Restituisce quelli con il file ancora in coda, da riprendere;
+    gli altri (dati mai scritti su disco) vanno ricaricati.
+    """
+    conn = connetti(base_dir)
+    orfani = conn.execute(
+        "SELECT id, nome_file FROM documenti WHERE stato IN (?, ?)", (IN_CODA, IN_ELABORAZIONE)
+    ).fetchall()
+    da_riprendere, persi = [], []
+    for doc_id, nome_file in orfani:
+        if os.path.exists(percorso_coda(doc_id, base_dir)):
+            da_riprendere.append((doc_id, nome_file))
+        else:
+            persi.append(doc_id)
+    with conn:
+        conn.executemany(
+            "UPDATE documenti SET stato = ?, errore = ? WHERE id = ?",
+            [(ERRORE, "Elaborazione interrotta dal riavvio dell'app: ricaricare il file", doc_id) for doc_id in persi]
+        )
+        conn.executemany("UPDATE documenti SET stato = ? WHERE id = ?", [(IN_CODA, doc_id) for doc_id, _ in da_riprendere])
+    conn.close()
+    return da_riprendere
+
+
+def pool_elaborazione(base_dir=CARTELLA_ARCHIVIO):
+    global _pool
+    with _lock_pool:
+        if _pool is None:
+            da_riprendere = _orfani(base_dir)
+            _pool = ThreadPoolExecutor(max_workers=MAX_WORKER, thread_name_prefix="elaborazione")
+            for doc_id, nome_file in da_riprendere:
+                _pool.submit(_lavoro, doc_id, nome_file, base_dir)
+        return _pool
+
+
+def _lavoro(doc_id, nome_file, base_dir):
+    percorso = percorso_coda(doc_id, base_dir)
+    try:
+        with open(percorso, "rb") as f:
+            dati = f.read()
+        elabora_documento(_connessione(base_dir), doc_id, nome_file, dati, base_dir)
+    except Exception:
+        # lo stato "errore" con il messaggio è già salvato nel database
+        logger.exception("Elaborazione documento %s (%s) fallita", doc_id, nome_file)
+    finally:
+        if os.path.exists(percorso):
+            os.remove(percorso)
+
+
+# Accoda i documenti caricati e ritorna subito gli id
+# conn → connessione della pagina (usata solo per registrare i documenti).
+# documenti → lista di tuple (nome_file, dati in bytes).
+def accoda_documenti(conn, documenti, tipo_documento, base_dir=CARTELLA_ARCHIVIO):
+    pool = pool_elaborazione(base_dir)
+    ids = registra_caricamenti(conn, [nome for nome, _ in documenti], tipo_documento)
+    for doc_id, (nome_file, dati) in zip(ids, documenti):
+        # il lavoro in coda tiene solo l'id: i dati aspettano su disco
+        _scrivi_coda(doc_id, dati, base_dir)
+        pool.submit(_lavoro, doc_id, nome_file, base_dir)
+    return ids
@@ -0,0 +1,159 @@
+# estrazione_testo.py
+"""
+Estrazione del testo dai documenti caricati, per l'indice di ricerca.
+- CSV: testo delle celle (il file è già testo, basta decodificarlo)
+- XLSX: valori di tutte le celle di tutti i fogli
+- PDF: testo delle pagine (pacchetto pypdf, in requirements.txt)
+- Immagini e formati sconosciuti: nessun testo
+Più alcuni metadati mostrati nell'elenco documenti: righe (CSV/XLSX),
+pagine (PDF) e anteprima (PNG/JPG).
+"""
+
+import io
+import os
+import re
+import threading
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # senza pypdf i PDF vengono indicizzati solo per nome
+    PdfReader = None
+
+# False se manca pypdf: la pagina avvisa che il contenuto dei PDF non è ricercabile
+TESTO_PDF_DISPONIBILE = PdfReader is not None
+
+
+def _estensione(nome_file):
+    return os.path.splitext(nome_file)[1].lower()
+
+
+def _decodifica(dati):
+    try:
+        return dati.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        # file esportati da Excel in Windows spesso sono in cp1252/latin-1
+        return dati.decode("latin-1")
+
+
+def testo_csv(dati):
+    # Il tokenizer dell'indice tratta virgole e punti e virgola come separatori,
+    # quindi il testo grezzo equivale al testo delle celle senza passare da pandas.
+    return _decodifica(dati)
+
+
+def testo_xlsx(dati):
+    from openpyxl import load_workbook
+
+    # read_only legge i fogli in streaming, senza caricare tutto il file in memoria
+    wb = load_workbook(io.BytesIO(dati), read_only=True, data_only=True)
+    parti = []
+    try:
+        for ws in wb.worksheets:
+            for riga in ws.iter_rows(values_only=True):
+                parti.extend(str(v) for v in riga if v is not None)
+    finally:
+        wb.close()
+    return " ".join(parti)
+
+
+def testo_pdf(dati):
+    if PdfReader is None:
+        return ""
+    reader = PdfReader(io.BytesIO(dati))
+    return "\n".join(pagina.extract_text() or "" for pagina in reader.pages)
+
+
+ESTRATTORI = {
+    ".csv": testo_csv,
+    ".xlsx": testo_xlsx,
+    ".pdf": testo_pdf,
+}
+
+
+def estrai_testo(nome_file, dati):
+    """
+    Restituisce il testo indicizzabile del documento.
+    Un file illeggibile non deve bloccare il salvataggio: in quel caso
+    il documento resta ricercabile solo per nome.
+    """
+    estrattore = ESTRATTORI.get(_estensione(nome_file))
+    if estrattore is None:
+        return ""
+    try:
+        return estrattore(dati)
+    except Exception:
+        return ""
+
+
+# --- Metadati
+# Come il testo, i metadati sono facoltativi: un file illeggibile dà None
+# invece di far fallire l'elaborazione del documento.
+
+def conta_righe(nome_file, dati):
+    """Numero di righe di dati (intestazione esclusa) per CSV e XLSX, altrimenti None."""
+    estensione = _estensione(nome_file)
+    if estensione == ".csv":
+        righe = dati.count(b"\n")
+        if dati and not dati.endswith(b"\n"):
+            righe += 1
+        return max(righe - 1, 0)
+    if estensione == ".xlsx":
+        from openpyxl import load_workbook
+
+        try:
+            wb = load_workbook(io.BytesIO(dati), read_only=True)
+        except Exception:
+            return None
+        try:
+            # senza dimensioni salvate nel file max_row è None: conto le righe a mano
+            return sum(
+                max((ws.max_row if ws.max_row is not None else sum(1 for _ in ws.iter_rows())) - 1, 0)
+                for ws in wb.worksheets
+            )
+        except Exception:
+            return None
+        finally:
+            wb.close()
+    return None
+
+
+def conta_pagine(nome_file, dati):
+    """Numero di pagine di un PDF, altrimenti None."""
+    if _estensione(nome_file) != ".pdf":
+        return None
+    if PdfReader is not None:
+        try:
+            return len(PdfReader(io.BytesIO(dati)).pages)
+        except Exception:
+            pass
+    # senza pypdf (o PDF che pypdf non legge): conto gli oggetti /Type /Page (esclusi i nodi /Pages)
+    return len(re.findall(rb"/Type\s*/Page(?!s)", dati))
+
+
+def crea_anteprima(nome_file, dati, destinazione, lato=128):
+    """
+    Salva una miniatura PNG di un'immagine e ne restituisce il percorso,
+    None per gli altri formati e per le immagini illeggibili.
+    Pillow è già una dipendenza di Streamlit.
+    """
+    if _estensione(nome_file) not in (".png", ".jpg", ".jpeg"):
+        return None
+    if not os.path.exists(destinazione):
+        from PIL import Image
+
+        # file temporaneo + os.replace: due worker sulla stessa immagine
+        # non lasciano mai una miniatura scritta a metà
+        tmp = f"{destinazione}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with Image.open(io.BytesIO(dati)) as img:
+                img.thumbnail((lato, lato))
+                # PNG non supporta CMYK o YCbCr (JPEG di scanner): converto in RGB
+                if img.mode not in ("1", "L", "LA", "P", "RGB", "RGBA"):
+                    img = img.convert("RGB")
+                img.save(tmp, "PNG")
+            os.replace(tmp, destinazione)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return None
+    return destinazione
@@ -14,11 +14,118 @@ import numpy as np
 import streamlit as st
 import plotly.express as px
 
+from strumentazione import misura, strumentato
+from tassi_storici import carica_tassi, tasso_incrociato, valute_mancanti
+
+# -----------------------
+# Helper
+# -----------------------
+# converte la colonna date in formato datetime.
+def parse_dates(df, date_col="date"):
+    df[date_col] = pd.to_datetime(df[date_col])
+    return df
+
+# controlla che il CSV abbia le colonne minime (invoice_id, date, currency, amount_foreign)
+def ensure_columns(df):
+    required = ["invoice_id", "date", "currency", "amount_foreign"]
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise ValueError(f"CSV mancante colonne: {', '.join(missing)}")
+    # if fx_rate_at_booking missing, we'll ask user for mapping or single rate
+    return df
+
+# calcola il controvalore in valuta base (exposure_base) moltiplicando amount_foreign * fx_rate.
+# Se non c’è la colonna fx_rate_at_booking, usa i tassi storici alla data fattura (tassi)
+# oppure i tassi manuali inseriti dall’utente (fx_mapping).
+@strumentato()
+def add_base_amount(df, base_currency, fx_mapping, tassi=None):
+    if "fx_rate_at_booking" in df.columns:
+        df["fx_rate"] = df["fx_rate_at_booking"].astype(float)
+    elif tassi is not None:
+        mancanti = valute_mancanti(pd.concat([df["currency"], pd.Series([base_currency])]), tassi)
+        if mancanti:
+            raise KeyError(f"Mancano tassi storici per le valute {', '.join(mancanti)}")
+        df["fx_rate"] = tasso_incrociato(df["currency"], base_currency, df["date"], tassi)
+    else:
+        def map_rate(c):
+            if c == base_currency:
+                return 1.0
+            if c in fx_mapping:
+                return float(fx_mapping[c])
+            raise KeyError(f"Manca tasso per valuta {c} e non è presente fx_rate_at_booking")
+        df["fx_rate"] = df["currency"].map(map_rate)
+    df["exposure_base"] = df["amount_foreign"].astype(float) * df["fx_rate"].astype(float)
+    return df
+
+# aggrega l’esposizione per mese o trimestre.
+@strumentato()
+def group_exposure(df, freq="M"):
+    # freq: 'M' month, 'Q' quarter
+    df2 = df.copy()
+    df2["period"] = df2["date"].dt.to_period(freq).dt.to_timestamp()
+    g = df2.groupby("period", as_index=False).agg(
+        exposure_foreign = ("amount_foreign", "sum"),
+        exposure_base = ("exposure_base", "sum")
+    ).sort_values("period")
+    return g
+
+@strumentato()
+def simulate_shocks(df, hedge_pct, forward_rate_map, shock_percents, base_currency):
+    """
+    applica degli shock ai tassi di cambio (es. ±10%),
+    calcola il P&L (profit/loss) con e senza copertura,
+    ritorna una tabella con i risultati.
+    """
+    results = []
+    for shock in shock_percents:
+        # compute spot after shock
+        df_tmp = df.copy()
+        # spot = booking_rate * (1 + shock)
+        df_tmp["spot_rate"] = df_tmp["fx_rate"] * (1 + shock)
+        # hedge proportion
+        h = hedge_pct / 100.0
+        # forward rate per currency; default to booking rate if not provided
+        def get_forward_rate(row):
+            c = row["currency"]
+            return forward_rate_map.get(c, row["fx_rate"])
+        df_tmp["forward_rate"] = df_tmp.apply(get_forward_rate, axis=1)
+        # P&L without hedge (base currency): (spot - booking) * amount_foreign
+        df_tmp["pl_unhedged"] = (df_tmp["spot_rate"] - df_tmp["fx_rate"]) * df_tmp["amount_foreign"]
+        # P&L if hedged proportion h at forward_rate:
+        # Hedged portion: (forward_rate - booking)*amount_foreign (locked)
+        # Unhedged portion: (spot_rate - booking)*amount_foreign
+        df_tmp["pl_hedged"] = ((1 - h) * (df_tmp["spot_rate"] - df_tmp["fx_rate"]) + h * (df_tmp["forward_rate"] - df_tmp["fx_rate"])) * df_tmp["amount_foreign"]
+        total_unhedged = df_tmp["pl_unhedged"].sum()
+        total_hedged = df_tmp["pl_hedged"].sum()
+        results.append({
+            "shock_pct": shock,
+            "total_pl_unhedged": total_unhedged,
+            "total_pl_hedged": total_hedged,
+            "delta_hedge": total_hedged - total_unhedged
+        })
+    return pd.DataFrame(results)
+
+# Monte Carlo: ripete simulate_shocks per ogni shock casuale e raccoglie il P&L totale
+@strumentato()
+def monte_carlo(df, hedge_pct, forward_rate_map, shocks_mc, base_currency):
+    total_pl_unhedged = []
+    total_pl_hedged = []
+    for s in shocks_mc:
+        res = simulate_shocks(df, hedge_pct, forward_rate_map, [s], base_currency)
+        total_pl_unhedged.append(res["total_pl_unhedged"].iloc[0])
+        total_pl_hedged.append(res["total_pl_hedged"].iloc[0])
+    return pd.DataFrame({
+        "pl_unhedged": total_pl_unhedged,
+        "pl_hedged": total_pl_hedged,
+        "pl_diff": np.array(total_pl_hedged) - np.array(total_pl_unhedged)
+    })
+
+
 def main():
     st.set_page_config(page_title="Rischio Cambio - Import", layout="wide")
 
     # -----------------------
-    # Helper / Defaults
+    # Defaults
     # -----------------------
     SAMPLE_CSV = """invoice_id,date,currency,amount_foreign,fx_rate_at_booking,description
     INV-001,2025-01-15,USD,15000,0.92,macchinario
@@ -27,82 +134,6 @@ def main():
     INV-004,2025-04-20,EUR,10000,1.0,spese
     """
 
-    # converte la colonna date in formato datetime.
-    def parse_dates(df, date_col="date"):
-        df[date_col] = pd.to_datetime(df[date_col])
-        return df
-
-    # controlla che il CSV abbia le colonne minime (invoice_id, date, currency, amount_foreign)
-    def ensure_columns(df):
-        required = ["invoice_id", "date", "currency", "amount_foreign"]
-        missing = [c for c in required if c not in df.columns]
-        if missing:
-            raise ValueError(f"CSV mancante colonne: {', '.join(missing)}")
-        # if fx_rate_at_booking missing, we'll ask user for mapping or single rate
-        return df
-
-    # calcola il controvalore in valuta base (exposure_base) moltiplicando amount_foreign * fx_rate.
-    # Se non c’è la colonna fx_rate_at_booking, chiede all’utente i tassi manuali.
-    def add_base_amount(df, base_currency, fx_mapping):
-        if "fx_rate_at_booking" in df.columns:
-            df["fx_rate"] = df["fx_rate_at_booking"].astype(float)
-        else:
-            def map_rate(c):
-                if c == base_currency:
-                    return 1.0
-                if c in fx_mapping:
-                    return float(fx_mapping[c])
-                raise KeyError(f"Manca tasso per valuta {c} e non è presente fx_rate_at_booking")
-            df["fx_rate"] = df["currency"].map(map_rate)
-        df["exposure_base"] = df["amount_foreign"].astype(float) * df["fx_rate"].astype(float)
-        return df
-
-    # aggrega l’esposizione per mese o trimestre.
-    def group_exposure(df, freq="M"):
-        # freq: 'M' month, 'Q' quarter
-        df2 = df.copy()
-        df2["period"] = df2["date"].dt.to_period(freq).dt.to_timestamp()
-        g = df2.groupby("period", as_index=False).agg(
-            exposure_foreign = ("amount_foreign", "sum"),
-            exposure_base = ("exposure_base", "sum")
-        ).sort_values("period")
-        return g
-
-    def simulate_shocks(df, hedge_pct, forward_rate_map, shock_percents, base_currency):
-        """
-        applica degli shock ai tassi di cambio (es. ±10%),
-        calcola il P&L (profit/loss) con e senza copertura,
-        ritorna una tabella con i risultati.
-        """
-        results = []
-        for shock in shock_percents:
-            # compute spot after shock
-            df_tmp = df.copy()
-            # spot = booking_rate * (1 + shock)
-            df_tmp["spot_rate"] = df_tmp["fx_rate"] * (1 + shock)
-            # hedge proportion
-            h = hedge_pct / 100.0
-            # forward rate per currency; default to booking rate if not provided
-            def get_forward_rate(row):
-                c = row["currency"]
-                return forward_rate_map.get(c, row["fx_rate"])
-            df_tmp["forward_rate"] = df_tmp.apply(get_forward_rate, axis=1)
-            # P&L without hedge (base currency): (spot - booking) * amount_foreign
-            df_tmp["pl_unhedged"] = (df_tmp["spot_rate"] - df_tmp["fx_rate"]) * df_tmp["amount_foreign"]
-            # P&L if hedged proportion h at forward_rate:
-            # Hedged portion: (forward_rate - booking)*amount_foreign (locked)
-            # Unhedged portion: (spot_rate - booking)*amount_foreign
-            df_tmp["pl_hedged"] = ((1 - h) * (df_tmp["spot_rate"] - df_tmp["fx_rate"]) + h * (df_tmp["forward_rate"] - df_tmp["fx_rate"])) * df_tmp["amount_foreign"]
-            total_unhedged = df_tmp["pl_unhedged"].sum()
-            total_hedged = df_tmp["pl_hedged"].sum()
-            results.append({
-                "shock_pct": shock,
-                "total_pl_unhedged": total_unhedged,
-                "total_pl_hedged": total_hedged,
-                "delta_hedge": total_hedged - total_unhedged
-            })
-        return pd.DataFrame(results)
-
     # -----------------------
     # UI
     # -----------------------
@@ -124,7 +155,8 @@ def main():
     # Dati reali (o CSV di esempio)
     if uploaded:
         try:
-            df = pd.read_csv(uploaded)
+            with misura("read_csv"):
+                df = pd.read_csv(uploaded)
         except Exception as e:
             st.error(f"Errore lettura CSV: {e}")
             st.stop()
@@ -150,35 +182,42 @@ def main():
     if not missing_rates:
         st.success("Il file contiene la colonna `fx_rate_at_booking` (tasso di conversione in valuta base al booking).")
     else:
-        st.info("Inserisci i tassi di conversione (base per 1 unità foreign) per le valute presenti.")
-        currencies = sorted(df['currency'].unique())
+        origine_tassi = st.radio("Origine dei tassi", ("Tassi storici alla data fattura", "Tassi manuali"))
         fx_mapping = {}
-        cols = st.columns(len(currencies))
-        for i,c in enumerate(currencies):
-            with cols[i]:
-                if c == base_currency:
-                    fx_mapping[c] = 1.0
-                    st.text_input(f"{c} → {base_currency}", value="1.0", key=f"fx_{c}", disabled=True)
-                else:
-                    val = st.text_input(f"{c} → {base_currency}", value="", key=f"fx_{c}")
-                    if val.strip() == "":
-                        fx_mapping[c] = None
+        tassi = None
+        if origine_tassi == "Tassi storici alla data fattura":
+            # archivio condiviso tassi_storici: ogni fattura al tasso della propria data
+            tassi = carica_tassi()
+            st.info("Per ogni fattura si usa l'ultimo tasso disponibile alla sua data nell'archivio dei tassi storici.")
+        else:
+            st.info("Inserisci i tassi di conversione (base per 1 unità foreign) per le valute presenti.")
+            currencies = sorted(df['currency'].unique())
+            cols = st.columns(len(currencies))
+            for i,c in enumerate(currencies):
+                with cols[i]:
+                    if c == base_currency:
+                        fx_mapping[c] = 1.0
+                        st.text_input(f"{c} → {base_currency}", value="1.0", key=f"fx_{c}", disabled=True)
                     else:
-                        try:
-                            fx_mapping[c] = float(val)
-                        except:
+                        val = st.text_input(f"{c} → {base_currency}", value="", key=f"fx_{c}")
+                        if val.strip() == "":
                             fx_mapping[c] = None
-        # check missing
-        if any(v is None for v in fx_mapping.values()):
-            st.warning("Compila tutti i tassi per proseguire oppure aggiungi la colonna `fx_rate_at_booking` al CSV.")
-            if st.button("Mostra preview dati (senza tassi completi)"):
-                st.dataframe(df.head())
-            st.stop()
+                        else:
+                            try:
+                                fx_mapping[c] = float(val)
+                            except:
+                                fx_mapping[c] = None
+            # check missing
+            if any(v is None for v in fx_mapping.values()):
+                st.warning("Compila tutti i tassi per proseguire oppure aggiungi la colonna `fx_rate_at_booking` al CSV.")
+                if st.button("Mostra preview dati (senza tassi completi)"):
+                    st.dataframe(df.head())
+                st.stop()
 
     # Add base amounts
     try:
         if missing_rates:
-            df = add_base_amount(df, base_currency, fx_mapping)
+            df = add_base_amount(df, base_currency, fx_mapping, tassi)
         else:
             df = add_base_amount(df, base_currency, {})
     except KeyError as e:
@@ -195,9 +234,10 @@ def main():
     freq = "M" if agg_choice == "Mensile" else "Q"
     grouped = group_exposure(df, freq=freq)
 
-    fig1 = px.bar(grouped, x="period", y="exposure_base", labels={"period":"Periodo","exposure_base":f"Esposizione ({base_currency})"},
-                title=f"Esposizione per {agg_choice.lower()} ({base_currency})")
-    st.plotly_chart(fig1, use_container_width=True)
+    with misura("grafico esposizione"):
+        fig1 = px.bar(grouped, x="period", y="exposure_base", labels={"period":"Periodo","exposure_base":f"Esposizione ({base_currency})"},
+                    title=f"Esposizione per {agg_choice.lower()} ({base_currency})")
+        st.plotly_chart(fig1, use_container_width=True)
 
     st.write("Dati aggregati:")
     st.dataframe(grouped)
@@ -244,11 +284,12 @@ def main():
     st.dataframe(sim_df)
 
     # Plot P&L per scenario
-    fig2 = px.line(sim_df.melt(id_vars="shock_pct", value_vars=["total_pl_unhedged","total_pl_hedged"],
-                            var_name="serie", value_name="PL"),
-                x="shock_pct", y="PL", color="serie",
-                title="P&L totale per scenario (shock percentuale)")
-    st.plotly_chart(fig2, use_container_width=True)
+    with misura("grafico scenari"):
+        fig2 = px.line(sim_df.melt(id_vars="shock_pct", value_vars=["total_pl_unhedged","total_pl_hedged"],
+                                var_name="serie", value_name="PL"),
+                    x="shock_pct", y="PL", color="serie",
+                    title="P&L totale per scenario (shock percentuale)")
+        st.plotly_chart(fig2, use_container_width=True)
 
     # Monte Carlo (opzionale)
     """
@@ -272,23 +313,14 @@ def main():
         rng = np.random.default_rng(seed=42)
         shocks_mc = rng.normal(loc=0.0, scale=vol_period, size=mc_sims)
         # compute P&L arrays
-        total_pl_unhedged = []
-        total_pl_hedged = []
-        for s in shocks_mc:
-            res = simulate_shocks(df, hedge_pct, forward_rate_map_clean, [s], base_currency)
-            total_pl_unhedged.append(res["total_pl_unhedged"].iloc[0])
-            total_pl_hedged.append(res["total_pl_hedged"].iloc[0])
-        mc_res = pd.DataFrame({
-            "pl_unhedged": total_pl_unhedged,
-            "pl_hedged": total_pl_hedged,
-            "pl_diff": np.array(total_pl_hedged) - np.array(total_pl_unhedged)
-        })
+        mc_res = monte_carlo(df, hedge_pct, forward_rate_map_clean, shocks_mc, base_currency)
         st.write("Statistiche Monte Carlo (totale portafoglio):")
         st.write(mc_res.describe().T)
         # histogram
-        fig_mc = px.histogram(mc_res.melt(value_vars=["pl_unhedged","pl_hedged"]), x="value", color="variable", barmode="overlay",
-                            title="Distribuzione P&L Monte Carlo")
-        st.plotly_chart(fig_mc, use_container_width=True)
+        with misura("grafico Monte Carlo"):
+            fig_mc = px.histogram(mc_res.melt(value_vars=["pl_unhedged","pl_hedged"]), x="value", color="variable", barmode="overlay",
+                                title="Distribuzione P&L Monte Carlo")
+            st.plotly_chart(fig_mc, use_container_width=True)
 
     # KPI e sintesi
     """
@@ -1,20 +1,52 @@
 import streamlit as st
-import pandas as pd
-import datetime
+
+from archivio_documenti import (
+    init_archivio, connetti, anteprima_data_uri, carica_documenti, cerca_documenti, conta_in_elaborazione, tipi_documento,
+)
+from estrazione_testo import TESTO_PDF_DISPONIBILE
+from elaborazione_documenti import accoda_documenti, pool_elaborazione
+from strumentazione import misura, strumentato
+
+# Preparazione dell'archivio una sola volta per processo (cache_resource, non a ogni rerun):
+# creazione delle tabelle, migrazione dello schema e indicizzazione dei documenti
+# mancanti scrivono sul database, i rerun della pagina invece leggono soltanto.
+@st.cache_resource(show_spinner="Apertura archivio documenti...")
+def prepara_archivio():
+    init_archivio().close()
+    # Pool di elaborazione in background (creato una sola volta per processo)
+    pool_elaborazione()
+
+
+# Una connessione per sessione: le transazioni (with conn:) di sessioni diverse
+# non devono condividere la stessa connessione. I rerun di una sessione sono
+# sequenziali, quindi la connessione può passare da un thread all'altro.
+def archivio():
+    prepara_archivio()
+    if "archivio_conn" not in st.session_state:
+        st.session_state["archivio_conn"] = connetti()
+    return st.session_state["archivio_conn"]
+
+# Senza testo di ricerca leggo l'elenco completo e filtro per tipo.
+# Con testo di ricerca interrogo l'indice full-text: i risultati sono
+# ordinati per rilevanza e il filtro per tipo è applicato nella stessa query.
+@strumentato()
+def filtra_documenti(conn, filtro_testo, filtro_tipo):
+    if filtro_testo.strip():
+        return cerca_documenti(conn, filtro_testo, filtro_tipo)
+    df = carica_documenti(conn)
+    if filtro_tipo:
+        df = df[df["Tipo Documento"].isin(filtro_tipo)]
+    return df
 
 def main():
     st.title("📦 Gestione Documentale Export")
     st.markdown("Carica, organizza e visualizza i documenti relativi all’export.")
 
-    # Stato persistente (rimane tra interazioni)
-    # st.session_state serve per salvare lo stato tra più interazioni (cioè se aggiorni la pagina non perdi i dati).
-    # Se non esiste ancora la chiave "documenti", creo un DataFrame vuoto con tre colonne:
-    # Nome File → nome del documento caricato
-    # Tipo Documento → es. Fattura, Dogana, Certificato
-    # Data Caricamento → data in cui l’utente lo ha caricato
-
-    if "documenti" not in st.session_state:
-        st.session_state.documenti = pd.DataFrame(columns=["Nome File", "Tipo Documento", "Data Caricamento"])
+    # Archivio persistente (rimane tra sessioni e riavvii)
+    # I file sono salvati su disco indicizzati per SHA-256 (archivio_documenti),
+    # i metadati in un indice SQLite: l'elenco si legge con una sola query,
+    # qualunque sia la storia della sessione.
+    conn = archivio()
 
     # Caricamento multiplo
     uploaded_files = st.file_uploader(
@@ -29,45 +61,47 @@ def main():
     )
 
     if uploaded_files and st.button("📥 Salva documenti"):
-        nuovi_doc = []
-        for file in uploaded_files:
-            nuovi_doc.append({
-                "Nome File": file.name,
-                "Tipo Documento": tipo_documento,
-                "Data Caricamento": datetime.date.today()
-            })
-
-        # Aggiungo al DataFrame esistente
-        # pd.concat per aggiungere le nuove righe al DataFrame esistente in st.session_state.documenti.
-        st.session_state.documenti = pd.concat(
-            [st.session_state.documenti, pd.DataFrame(nuovi_doc)],
-            ignore_index=True
-        )
-        st.success("✅ Documenti caricati e salvati con successo!")
+        # Registro i documenti e li accodo: hash, testo, righe/pagine e anteprime
+        # vengono calcolati in background, la pagina non resta bloccata
+        with misura("accoda_documenti"):
+            accoda_documenti(conn, [(file.name, file.getvalue()) for file in uploaded_files], tipo_documento)
+        st.success("✅ Documenti caricati: elaborazione in corso in background.")
+
+    # Stato dell'elaborazione (colonna "Stato" nella tabella)
+    in_elaborazione = conta_in_elaborazione(conn)
+    if in_elaborazione:
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.info(f"⏳ {in_elaborazione} documenti in elaborazione.")
+        with col2:
+            st.button("🔄 Aggiorna stato")
 
     # 🔍 Filtro e ricerca
 
     st.subheader("🔍 Ricerca documenti")
-    filtro_tipo = st.multiselect("Filtra per tipo", st.session_state.documenti["Tipo Documento"].unique())
-    filtro_nome = st.text_input("Cerca per nome")
+    filtro_tipo = st.multiselect("Filtra per tipo", tipi_documento(conn))
+    filtro_testo = st.text_input("Cerca per nome o contenuto (numero fattura, codice HS, cliente)")
+    if not TESTO_PDF_DISPONIBILE:
+        st.caption("⚠️ Pacchetto pypdf non installato: dei PDF si cerca solo il nome del file, non il contenuto.")
 
-    # Creo una copia del DataFrame con i documenti.
-    # Applico i filtri scelti (tipo e nome).
+    # Applico i filtri scelti (tipo e testo).
     # Mostro il risultato in tabella con st.dataframe.
 
-    df_filtered = st.session_state.documenti.copy()
+    df_filtered = filtra_documenti(conn, filtro_testo, filtro_tipo)
 
-    if filtro_tipo:
-        df_filtered = df_filtered[df_filtered["Tipo Documento"].isin(filtro_tipo)]
-    if filtro_nome:
-        df_filtered = df_filtered[df_filtered["Nome File"].str.contains(filtro_nome, case=False, na=False)]
-
-    st.dataframe(df_filtered, use_container_width=True)
+    # Miniature delle immagini (PNG/JPG) nella prima colonna della tabella
+    tabella = df_filtered.assign(Anteprima=df_filtered["Anteprima"].map(anteprima_data_uri, na_action="ignore"))
+    tabella = tabella[["Anteprima"] + [c for c in tabella.columns if c != "Anteprima"]]
+    st.dataframe(
+        tabella,
+        use_container_width=True,
+        column_config={"Anteprima": st.column_config.ImageColumn("Anteprima")},
+    )
 
     # (Opzionale) download tabella
     # Se il DataFrame filtrato non è vuoto, lo trasformo in CSV.
     if not df_filtered.empty:
-        csv = df_filtered.to_csv(index=False).encode("utf-8")
+        csv = df_filtered.drop(columns="Anteprima").to_csv(index=False).encode("utf-8")
         st.download_button("⬇️ Scarica registro", csv, "documenti_export.csv", "text/csv")
 
 if __name__ == "__main__":
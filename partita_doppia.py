@@ -3,9 +3,11 @@ import sqlite3
 from datetime import datetime
 import pandas as pd
 
+from strumentazione import misura, strumentato
+
 # Database connection
-def init_db():
-    conn = sqlite3.connect("partita_doppia.db")
+def init_db(percorso="partita_doppia.db"):
+    conn = sqlite3.connect(percorso)
     c = conn.cursor()
     c.execute("""
     CREATE TABLE IF NOT EXISTS scritture (
@@ -28,6 +30,7 @@ def init_db():
 # tipo → il tipo di operazione scelta (es. “Acquisto estero”).
 # righe → una lista di tuple (conto_dare, conto_avere, importo).
 # descrizione → testo libero inserito dall’utente.
+@strumentato()
 def registra_scrittura(conn, data, tipo, righe, descrizione=""):
     c = conn.cursor()
     # Il ciclo for itera su tutte le righe contabili collegate a quell’operazione.
@@ -43,6 +46,11 @@ def registra_scrittura(conn, data, tipo, righe, descrizione=""):
         )
     conn.commit()
 
+# Tutte le scritture in ordine di registrazione
+def leggi_scritture(conn):
+    with misura("read_sql_query"):
+        return pd.read_sql_query("SELECT * FROM scritture ORDER BY id", conn)
+
 def main():
     # --- Interfaccia Streamlit
     st.title("💼 Modulo Partita Doppia - Import/Export")
@@ -115,7 +123,7 @@ def main():
 
     # Visualizzazione scritture raggruppate per operazione
     st.subheader("📊 Scritture registrate (raggruppate per operazione)")
-    df_scritture = pd.read_sql_query("SELECT * FROM scritture ORDER BY id", conn)
+    df_scritture = leggi_scritture(conn)
     st.dataframe(df_scritture)
 
     # filtri
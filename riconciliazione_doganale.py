@@ -1,4 +1,5 @@
-#Supporto multi-valuta → tutto convertito in CHF con tassi fissi.
+#Supporto multi-valuta → tutto convertito in CHF con tassi fissi
+#   oppure con i tassi storici alla data del documento (tassi_storici).
 #Evidenzia graficamente le discrepanze usando colori.
 #Filtri per tipo di anomalia:
 #   Solo fatture mancanti in dogana
@@ -8,6 +9,99 @@
 import streamlit as st
 import pandas as pd
 
+from strumentazione import misura
+from tassi_storici import carica_tassi, converti_in_chf, valute_mancanti
+
+# Tassi di cambio fissi
+EXCHANGE_RATES = {"CHF": 1.0, "EUR": 0.95, "USD": 0.88}
+
+# legge i file
+def load_file(file):
+    if file is None:
+        return None
+    if file.name.endswith(".csv"):
+        return pd.read_csv(file)
+    else:
+        return pd.read_excel(file)
+
+
+# Conversione in CHF con i tassi storici: ogni documento al tasso della propria
+# colonna Data; senza colonna Data si usa il tasso più recente.
+def valore_chf_storico(df, tassi):
+    date = df["Data"] if "Data" in df.columns else pd.Series(pd.Timestamp.today(), index=df.index)
+    valore_chf = converti_in_chf(df["Valore"], df["Valuta"], date, tassi)
+    # valuta assente dall'archivio: nessuna conversione, come con EXCHANGE_RATES.get(valuta, 1)
+    return pd.Series(valore_chf, index=df.index).fillna(df["Valore"].astype(float))
+
+
+# Conversione in CHF e confronto fatture/dogane su NumeroDocumento
+# tassi → serie storica di tassi_storici; se None si usano i tassi fissi EXCHANGE_RATES
+def riconcilia(df_fatture, df_dogane, tassi=None):
+    # Conversione valute in CHF
+    # df_fatture.apply(...)
+    # apply() applica una funzione a ogni riga del DataFrame.
+    # lambda x: ... → funzione anonima che prende la riga x.
+    # x["Valore"]/EXCHANGE_RATES.get(x["Valuta"],1)
+    # Prende il valore originale della merce (x["Valore"]).
+    # Divide per il tasso della valuta (x["Valuta"]) per convertirlo in CHF.
+    # get(x["Valuta"],1) → se la valuta non è nel dizionario, usa 1 come default (nessuna conversione).
+    # axis=1
+    # Indica che la funzione viene applicata riga per riga e non per colonna.
+    # Risultato
+    # Viene creata una nuova colonna Valore_CHF sia in df_fatture sia in df_dogane.
+    # Tutti i valori ora sono confrontabili direttamente in CHF.
+
+    with misura("conversione CHF"):
+        if tassi is None:
+            df_fatture["Valore_CHF"] = df_fatture.apply(lambda x: x["Valore"]/EXCHANGE_RATES.get(x["Valuta"],1), axis=1)
+            df_dogane["Valore_CHF"] = df_dogane.apply(lambda x: x["Valore"]/EXCHANGE_RATES.get(x["Valuta"],1), axis=1)
+        else:
+            df_fatture["Valore_CHF"] = valore_chf_storico(df_fatture, tassi)
+            df_dogane["Valore_CHF"] = valore_chf_storico(df_dogane, tassi)
+
+    # merge
+    # df_fatture → DataFrame delle fatture
+    # df_dogane → DataFrame dei dati doganali
+    # on="NumeroDocumento" → chiave comune su cui unire i due file.
+    # Parametri principali
+    # suffixes=("_fattura", "_dogana")
+    #   Se ci sono colonne con lo stesso nome in entrambi i file (ad esempio Valore o Valuta), Pandas aggiunge il suffisso _fattura o _dogana per distinguerle.
+    # how="outer"
+    # Determina il tipo di merge:
+    #   "inner" → conserva solo le righe che hanno la chiave in entrambi i file
+    #   "left" → conserva tutte le righe di df_fatture, anche se non hanno corrispondenza in df_dogane
+    #   "right" → conserva tutte le righe di df_dogane, anche se non hanno corrispondenza in df_fatture
+    #   "outer" → conserva tutte le righe di entrambi i file → perfetto per riconciliazione perché vogliamo vedere anche i documenti mancanti
+    #indicator=True
+    #   Aggiunge una colonna _merge con valori:
+    #   "both" → presente in entrambi i file
+    #   "left_only" → presente solo in df_fatture
+    #   "right_only" → presente solo in df_dogane
+
+    with misura("pd.merge"):
+        merged = pd.merge(
+            df_fatture,
+            df_dogane,
+            on="NumeroDocumento",
+            suffixes=("_fattura", "_dogana"),
+            how="outer",
+            indicator=True
+        )
+    # Calcola la differenza tra il valore della fattura e quello dichiarato alla dogana.
+    merged["Differenza_Valore"] = merged["Valore_fattura"].fillna(0) - merged["Valore_dogana"].fillna(0)
+    return merged
+
+
+# Colore rosso se discrepanza
+def highlight_discrepancy(row):
+    if row["_merge"] != "both":
+        return ['background-color: yellow']*len(row)
+    elif row["Differenza_Valore"] != 0:
+        return ['background-color: red']*len(row)
+    else:
+        return ['background-color: lightgreen']*len(row)
+
+
 def main():
     st.set_page_config(page_title="Riconciliazione Doganale", page_icon="📑", layout="wide")
 
@@ -23,20 +117,9 @@ def main():
     with col2:
         file_dogane = st.file_uploader("📂 Carica file Dogane (Excel/CSV)", type=["csv", "xlsx"])
 
-    # Tassi di cambio fissi
-    EXCHANGE_RATES = {"CHF": 1.0, "EUR": 0.95, "USD": 0.88}
-
-    # legge i file
-    def load_file(file):
-        if file is None:
-            return None
-        if file.name.endswith(".csv"):
-            return pd.read_csv(file)
-        else:
-            return pd.read_excel(file)
-
-    df_fatture = load_file(file_fatture)
-    df_dogane = load_file(file_dogane)
+    with misura("load_file"):
+        df_fatture = load_file(file_fatture)
+        df_dogane = load_file(file_dogane)
 
     # Se entrambi i file sono caricati, mostra un’anteprima delle prime righe (head()) nella UI.
     if df_fatture is not None and df_dogane is not None:
@@ -55,65 +138,22 @@ def main():
         #indicator=True → aggiunge una colonna _merge che indica se il documento è presente in entrambi o solo in uno dei due file
         
         if "NumeroDocumento" in df_fatture.columns and "NumeroDocumento" in df_dogane.columns:
-            # Conversione valute in CHF
-            # df_fatture.apply(...)
-            # apply() applica una funzione a ogni riga del DataFrame.
-            # lambda x: ... → funzione anonima che prende la riga x.
-            # x["Valore"]/EXCHANGE_RATES.get(x["Valuta"],1)
-            # Prende il valore originale della merce (x["Valore"]).
-            # Divide per il tasso della valuta (x["Valuta"]) per convertirlo in CHF.
-            # get(x["Valuta"],1) → se la valuta non è nel dizionario, usa 1 come default (nessuna conversione).
-            # axis=1
-            # Indica che la funzione viene applicata riga per riga e non per colonna.
-            # Risultato
-            # Viene creata una nuova colonna Valore_CHF sia in df_fatture sia in df_dogane.
-            # Tutti i valori ora sono confrontabili direttamente in CHF.
-
-            df_fatture["Valore_CHF"] = df_fatture.apply(lambda x: x["Valore"]/EXCHANGE_RATES.get(x["Valuta"],1), axis=1)
-            df_dogane["Valore_CHF"] = df_dogane.apply(lambda x: x["Valore"]/EXCHANGE_RATES.get(x["Valuta"],1), axis=1)
+            # Tassi: fissi oppure storici alla data del documento (colonna Data)
+            usa_storici = st.checkbox("Converti con i tassi storici alla data del documento (colonna Data)")
+            tassi = None
+            if usa_storici:
+                tassi = carica_tassi()
+                mancanti = valute_mancanti(pd.concat([df_fatture["Valuta"], df_dogane["Valuta"]]), tassi)
+                if mancanti:
+                    st.warning(f"Valute senza tassi storici (non convertite): {', '.join(mancanti)}")
 
-            # merge
-            # df_fatture → DataFrame delle fatture
-            # df_dogane → DataFrame dei dati doganali
-            # on="NumeroDocumento" → chiave comune su cui unire i due file.
-            # Parametri principali
-            # suffixes=("_fattura", "_dogana")
-            #   Se ci sono colonne con lo stesso nome in entrambi i file (ad esempio Valore o Valuta), Pandas aggiunge il suffisso _fattura o _dogana per distinguerle.
-            # how="outer"
-            # Determina il tipo di merge:
-            #   "inner" → conserva solo le righe che hanno la chiave in entrambi i file
-            #   "left" → conserva tutte le righe di df_fatture, anche se non hanno corrispondenza in df_dogane
-            #   "right" → conserva tutte le righe di df_dogane, anche se non hanno corrispondenza in df_fatture
-            #   "outer" → conserva tutte le righe di entrambi i file → perfetto per riconciliazione perché vogliamo vedere anche i documenti mancanti
-            #indicator=True
-            #   Aggiunge una colonna _merge con valori:
-            #   "both" → presente in entrambi i file
-            #   "left_only" → presente solo in df_fatture
-            #   "right_only" → presente solo in df_dogane
-
-            merged = pd.merge(
-                df_fatture,
-                df_dogane,
-                on="NumeroDocumento",
-                suffixes=("_fattura", "_dogana"),
-                how="outer",
-                indicator=True
-            )
-            # Calcola la differenza tra il valore della fattura e quello dichiarato alla dogana.
-            merged["Differenza_Valore"] = merged["Valore_fattura"].fillna(0) - merged["Valore_dogana"].fillna(0)
+            merged = riconcilia(df_fatture, df_dogane, tassi)
 
             st.subheader("📊 Risultati riconciliazione")
 
-            # Colore rosso se discrepanza
-            def highlight_discrepancy(row):
-                if row["_merge"] != "both":
-                    return ['background-color: yellow']*len(row)
-                elif row["Differenza_Valore"] != 0:
-                    return ['background-color: red']*len(row)
-                else:
-                    return ['background-color: lightgreen']*len(row)
-
-            st.dataframe(merged.style.apply(highlight_discrepancy, axis=1))
+            # lo Styler viene calcolato qui, quando st.dataframe lo serializza
+            with misura("styling"):
+                st.dataframe(merged.style.apply(highlight_discrepancy, axis=1))
 
             # Filtri
             #A seconda dell’opzione selezionata, si crea un DataFrame filtered con le righe corrispondenti.
@@ -0,0 +1,180 @@
+# strumentazione.py
+"""
+Misura dei tempi delle pagine dell'hub.
+- misura("nome"): blocco with che registra uno span (inizio, durata, annidamento)
+- strumentato("nome"): la stessa cosa come decoratore di funzione
+- un rerun alla volta per thread: Streamlit esegue ogni rerun in un proprio thread,
+  quindi gli span di sessioni diverse non si mescolano
+- profilazione opzionale di un singolo rerun (pyinstrument, in requirements-dev.txt;
+  se manca si ripiega su cProfile e il pannello lo segnala)
+- esportazione in formato Chrome Trace (chrome://tracing, https://ui.perfetto.dev)
+
+Se la misura non è attiva misura() restituisce sempre lo stesso contesto vuoto:
+il costo è una lettura di attributo per chiamata.
+"""
+
+import contextlib
+import functools
+import io
+import json
+import os
+import threading
+import time
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # pyinstrument è opzionale: senza, si usa cProfile (deterministico)
+    Profiler = None
+
+# Mostrato nel pannello: cProfile strumenta ogni chiamata e gonfia i tempi
+# del codice con molte chiamate brevi (pandas), pyinstrument no
+PROFILATORE = "pyinstrument" if Profiler is not None else "cProfile"
+
+# Il pannello di debug compare solo se HUB_DEBUG è impostata
+PANNELLO_ATTIVO = os.environ.get("HUB_DEBUG", "") not in ("", "0")
+CARTELLA_TRACCE = os.environ.get("HUB_TRACCE", "tracce")
+
+_NULLO = contextlib.nullcontext()
+_locale = threading.local()
+
+
+class _Span:
+    __slots__ = ("nome", "rerun", "inizio")
+
+    def __init__(self, nome, rerun):
+        self.nome = nome
+        self.rerun = rerun
+
+    def __enter__(self):
+        self.rerun["profondita"] += 1
+        self.inizio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        fine = time.perf_counter()
+        self.rerun["profondita"] -= 1
+        self.rerun["span"].append({
+            "nome": self.nome,
+            "inizio_ms": (self.inizio - self.rerun["inizio"]) * 1000,
+            "durata_ms": (fine - self.inizio) * 1000,
+            "profondita": self.rerun["profondita"],
+        })
+        return False
+
+
+def misura(nome):
+    rerun = getattr(_locale, "rerun", None)
+    if rerun is None:
+        return _NULLO
+    return _Span(nome, rerun)
+
+
+def strumentato(nome=None):
+    def decoratore(funzione):
+        etichetta = nome or funzione.__name__
+
+        @functools.wraps(funzione)
+        def wrapper(*args, **kwargs):
+            with misura(etichetta):
+                return funzione(*args, **kwargs)
+        return wrapper
+    return decoratore
+
+
+# --- Ciclo di vita di un rerun
+
+def inizia_rerun(etichetta=""):
+    """Attiva la misura per il rerun in corso nel thread corrente."""
+    _locale.rerun = {
+        "etichetta": etichetta,
+        "timestamp": time.time(),
+        "inizio": time.perf_counter(),
+        "profondita": 0,
+        "span": [],
+        "thread": threading.get_ident(),
+    }
+
+
+def termina_rerun():
+    """Disattiva la misura e restituisce il rerun registrato (None se non era attiva)."""
+    rerun = getattr(_locale, "rerun", None)
+    _locale.rerun = None
+    if rerun is not None:
+        rerun["durata_ms"] = (time.perf_counter() - rerun["inizio"]) * 1000
+    return rerun
+
+
+def riepilogo(rerun):
+    """Tempo per fase del rerun: chiamate, totale in ms e quota sul rerun."""
+    import pandas as pd
+
+    df = pd.DataFrame(rerun["span"], columns=["nome", "inizio_ms", "durata_ms", "profondita"])
+    g = df.groupby("nome", sort=False).agg(chiamate=("durata_ms", "size"), totale_ms=("durata_ms", "sum"),
+                                           profondita=("profondita", "min"))
+    g["quota_%"] = g["totale_ms"] / rerun["durata_ms"] * 100
+    return g.sort_values("totale_ms", ascending=False).round(2).reset_index()
+
+
+# --- Esportazione
+
+def traccia_chrome(reruns):
+    """Eventi in formato Chrome Trace: un evento "X" (completo) per ogni span."""
+    eventi = []
+    for rerun in reruns:
+        base_us = rerun["timestamp"] * 1e6
+        eventi.append({"name": rerun["etichetta"] or "rerun", "ph": "X", "pid": os.getpid(),
+                       "tid": rerun["thread"], "ts": base_us, "dur": rerun["durata_ms"] * 1000})
+        for s in rerun["span"]:
+            eventi.append({"name": s["nome"], "ph": "X", "pid": os.getpid(), "tid": rerun["thread"],
+                           "ts": base_us + s["inizio_ms"] * 1000, "dur": s["durata_ms"] * 1000})
+    return {"traceEvents": eventi, "displayTimeUnit": "ms"}
+
+
+def esporta_tracce(reruns, cartella=CARTELLA_TRACCE):
+    os.makedirs(cartella, exist_ok=True)
+    percorso = os.path.join(cartella, time.strftime("tracce_%Y%m%d_%H%M%S.json"))
+    with open(percorso, "w", encoding="utf-8") as f:
+        json.dump(traccia_chrome(reruns), f)
+    return percorso
+
+
+# --- Profilazione di un singolo rerun
+
+class ProfiloRerun:
+    """
+    Profilo di un rerun: pyinstrument (a campionamento, basso overhead) se disponibile,
+    altrimenti cProfile. Al termine salva il profilo in CARTELLA_TRACCE.
+    """
+
+    def __init__(self, cartella=CARTELLA_TRACCE):
+        self.cartella = cartella
+        if Profiler is not None:
+            self._profiler = Profiler()
+        else:
+            import cProfile
+            self._profiler = cProfile.Profile()
+
+    def avvia(self):
+        if Profiler is not None:
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def ferma(self):
+        """Ferma il profilo, lo salva su file e restituisce (percorso, testo riassuntivo)."""
+        os.makedirs(self.cartella, exist_ok=True)
+        nome = time.strftime("profilo_%Y%m%d_%H%M%S")
+        if Profiler is not None:
+            self._profiler.stop()
+            percorso = os.path.join(self.cartella, nome + ".html")
+            with open(percorso, "w", encoding="utf-8") as f:
+                f.write(self._profiler.output_html())
+            return percorso, self._profiler.output_text(unicode=True, color=False)
+
+        import pstats
+        self._profiler.disable()
+        percorso = os.path.join(self.cartella, nome + ".prof")
+        self._profiler.dump_stats(percorso)
+        testo = io.StringIO()
+        pstats.Stats(self._profiler, stream=testo).sort_stats("cumulative").print_stats(30)
+        return percorso, testo.getvalue()
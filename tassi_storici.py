@@ -0,0 +1,122 @@
+# tassi_storici.py
+"""
+Archivio locale dei tassi di cambio storici, condiviso dalle pagine dell'hub.
+- File CSV con colonne Data, Valuta, Tasso (unità di valuta per 1 CHF,
+  la stessa convenzione di EXCHANGE_RATES e dei campi "CHF → EUR").
+  CHF non va indicato: vale sempre 1.
+- Conversione "as-of": ogni documento usa l'ultimo tasso disponibile alla
+  propria data, con un unico pd.merge_asof su tutte le righe.
+  Le date precedenti al primo tasso usano il primo tasso disponibile.
+
+Il file di partenza contiene i tassi fissi usati finora dai moduli;
+per lo storico completo basta aggiungere righe (una per data e valuta).
+"""
+
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+
+PERCORSO_TASSI = os.environ.get(
+    "HUB_TASSI_STORICI",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "Data", "tassi_storici.csv"),
+)
+
+
+@functools.lru_cache(maxsize=4)
+def _leggi(percorso, modificato):
+    # modificato (mtime) fa parte della chiave: se il file cambia viene riletto
+    tassi = pd.read_csv(percorso, parse_dates=["Data"])
+    tassi["Valuta"] = tassi["Valuta"].str.upper().str.strip()
+    tassi["Tasso"] = tassi["Tasso"].astype(float)
+    # merge_asof richiede la colonna "on" ordinata
+    return tassi.sort_values(["Data", "Valuta"]).drop_duplicates(["Data", "Valuta"], keep="last").reset_index(drop=True)
+
+
+def carica_tassi(percorso=PERCORSO_TASSI):
+    """Serie storica dei tassi (Data, Valuta, Tasso) ordinata per data."""
+    return _leggi(percorso, os.path.getmtime(percorso))
+
+
+def ultimi_tassi(tassi):
+    """Dizionario valuta → tasso più recente, CHF compreso."""
+    ultimi = tassi.groupby("Valuta")["Tasso"].last().to_dict()
+    ultimi["CHF"] = 1.0
+    return ultimi
+
+
+def _date_confrontabili(date):
+    # merge_asof non accetta date mancanti né il confronto tra date con e senza fuso orario:
+    # le date con fuso perdono il fuso (resta l'ora locale), quelle mancanti diventano oggi.
+    # Stessa risoluzione (ns) per le due tabelle, richiesta anch'essa da merge_asof.
+    date = pd.to_datetime(pd.Series(date).reset_index(drop=True))
+    if date.dt.tz is not None:
+        date = date.dt.tz_localize(None)
+    return date.fillna(pd.Timestamp.today().normalize()).astype("datetime64[ns]")
+
+
+def tassi_asof(date, valute, tassi):
+    """
+    Tasso (unità di valuta per 1 CHF) valido alla data di ogni riga.
+    date e valute sono sequenze della stessa lunghezza; il risultato è un
+    array nello stesso ordine, NaN per le valute vuote o assenti dall'archivio.
+    Una data mancante usa il tasso più recente.
+    """
+    # Le valute diventano codici interi: normalizzazione solo sui valori distinti
+    # e merge_asof "by" su interi, molto più veloce che su stringhe con milioni di righe.
+    # factorize dà -1 alle valute mancanti: l'ultimo elemento aggiunto alle tabelle
+    # di conversione (-1 = nessuna valuta, non CHF) le fa finire su NaN.
+    codici, distinte = pd.factorize(pd.Series(valute).reset_index(drop=True))
+    distinte = pd.Index(distinte).astype(str).str.upper().str.strip()
+    elenco = pd.Index(tassi["Valuta"].unique())
+    righe = pd.DataFrame({
+        "Data": _date_confrontabili(date),
+        "_valuta": np.append(elenco.get_indexer(distinte), -1)[codici],
+        "_pos": np.arange(len(codici)),
+    }).sort_values("Data")
+    storico = pd.DataFrame({
+        "Data": _date_confrontabili(tassi["Data"]),
+        "_valuta": elenco.get_indexer(tassi["Valuta"]),
+        "Tasso": tassi["Tasso"],
+    })
+
+    risultato = np.empty(len(righe))
+    indietro = pd.merge_asof(righe, storico, on="Data", by="_valuta", direction="backward")
+    risultato[indietro["_pos"].to_numpy()] = indietro["Tasso"].to_numpy()
+
+    # date anteriori al primo tasso della valuta: uso il primo disponibile
+    prima = np.isnan(risultato)
+    if prima.any():
+        avanti = pd.merge_asof(righe, storico, on="Data", by="_valuta", direction="forward")
+        valori_avanti = np.empty(len(righe))
+        valori_avanti[avanti["_pos"].to_numpy()] = avanti["Tasso"].to_numpy()
+        risultato[prima] = valori_avanti[prima]
+
+    chf = np.append(np.asarray(distinte == "CHF"), False)[codici]
+    risultato[chf] = 1.0
+    return risultato
+
+
+def valute_mancanti(valute, tassi):
+    """Valute senza tassi nell'archivio; "(vuota)" se ci sono righe senza valuta."""
+    presenti = set(tassi["Valuta"]) | {"CHF"}
+    valute = pd.Series(valute).astype("string").str.upper().str.strip()
+    vuote = valute.isna() | (valute == "")
+    mancanti = sorted(set(valute[~vuote]) - presenti)
+    return mancanti + ["(vuota)"] if vuote.any() else mancanti
+
+
+def converti_in_chf(valori, valute, date, tassi):
+    """Controvalore in CHF di ogni importo al tasso della sua data."""
+    return np.asarray(valori, dtype=float) / tassi_asof(date, valute, tassi)
+
+
+def tasso_incrociato(valute, base, date, tassi):
+    """
+    Unità di valuta base per 1 unità di valuta estera alla data di ogni riga
+    (la convenzione di fx_rate in fx_risk_app), passando per il CHF.
+    """
+    tasso_estera = tassi_asof(date, valute, tassi)
+    tasso_base = tassi_asof(date, [base] * len(tasso_estera), tassi)
+    return tasso_base / tasso_estera